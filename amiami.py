@@ -1,52 +1,57 @@
 from math import ceil
+from concurrent.futures import ThreadPoolExecutor
 # import logging
-from curl_cffi import requests
+from http_sessions import amiami_session
 
 
 rootURL = "https://api.amiami.com/api/v1.0/items"
 PER_PAGE = 30
+# max number of page requests in flight when fetching pages in parallel
+MAX_IN_FLIGHT = 4
+
+# raw API fields copied onto every Item
+ITEM_FIELDS = (
+    'gcode', 'gname', 'thumb_url', 'thumb_alt', 'thumb_title', 'min_price',
+    'max_price', 'c_price_taxed', 'maker_name', 'saleitem', 'condition_flg',
+    'list_preorder_available', 'list_backorder_available', 'list_store_bonus',
+    'list_amiami_limited', 'instock_flg', 'order_closed_flg', 'element_id',
+    'salestatus', 'salestatus_detail', 'releasedate', 'jancode',
+    'preorderitem', 'saletopitem', 'resale_flg', 'preowned_sale_flg',
+    'for_women_flg', 'genre_moe', 'cate6', 'cate7', 'buy_flg', 'buy_price',
+    'buy_remarks', 'stock_flg', 'image_on', 'image_category', 'image_name',
+    'metaalt',
+)
 
 class Item:
+    # slots instead of a per-instance __dict__: crawls keep every Item alive in
+    # ResultSet.items, so the dict overhead dominated memory on large keywords
+    __slots__ = ITEM_FIELDS + ('_availability',)
+
     def __init__(self, api_data):
         # Store all raw API data
-        self.gcode = api_data.get('gcode')
-        self.gname = api_data.get('gname')
-        self.thumb_url = api_data.get('thumb_url')
-        self.thumb_alt = api_data.get('thumb_alt')
-        self.thumb_title = api_data.get('thumb_title')
-        self.min_price = api_data.get('min_price')
-        self.max_price = api_data.get('max_price')
-        self.c_price_taxed = api_data.get('c_price_taxed')
-        self.maker_name = api_data.get('maker_name')
-        self.saleitem = api_data.get('saleitem')
-        self.condition_flg = api_data.get('condition_flg')
-        self.list_preorder_available = api_data.get('list_preorder_available')
-        self.list_backorder_available = api_data.get('list_backorder_available')
-        self.list_store_bonus = api_data.get('list_store_bonus')
-        self.list_amiami_limited = api_data.get('list_amiami_limited')
-        self.instock_flg = api_data.get('instock_flg')
-        self.order_closed_flg = api_data.get('order_closed_flg')
-        self.element_id = api_data.get('element_id')
-        self.salestatus = api_data.get('salestatus')
-        self.salestatus_detail = api_data.get('salestatus_detail')
-        self.releasedate = api_data.get('releasedate')
-        self.jancode = api_data.get('jancode')
-        self.preorderitem = api_data.get('preorderitem')
-        self.saletopitem = api_data.get('saletopitem')
-        self.resale_flg = api_data.get('resale_flg')
-        self.preowned_sale_flg = api_data.get('preowned_sale_flg')
-        self.for_women_flg = api_data.get('for_women_flg')
-        self.genre_moe = api_data.get('genre_moe')
-        self.cate6 = api_data.get('cate6')
-        self.cate7 = api_data.get('cate7')
-        self.buy_flg = api_data.get('buy_flg')
-        self.buy_price = api_data.get('buy_price')
-        self.buy_remarks = api_data.get('buy_remarks')
-        self.stock_flg = api_data.get('stock_flg')
-        self.image_on = api_data.get('image_on')
-        self.image_category = api_data.get('image_category')
-        self.image_name = api_data.get('image_name')
-        self.metaalt = api_data.get('metaalt')
+        for field in ITEM_FIELDS:
+            setattr(self, field, api_data.get(field))
+
+    def to_dict(self):
+        """
+        Serializa el item a un dict con los campos crudos de la API y las
+        propiedades calculadas, evaluando flags/availability una sola vez.
+        """
+        data = {field: getattr(self, field) for field in ITEM_FIELDS}
+        flags = self.flags
+        try:
+            availability = self._availability
+        except AttributeError:
+            availability = self._availability = _availability_from_flags(flags)
+        data["availability"] = availability
+        data["flags"] = flags
+        data["imageURL"] = self.imageURL
+        data["price"] = self.max_price
+        data["productCode"] = self.gcode
+        data["productName"] = self.gname
+        data["productURL"] = self.productURL
+        data["releaseDate"] = self.releasedate
+        return data
 
     # Computed properties for backward compatibility
     @property
@@ -75,33 +80,12 @@ class Item:
 
     @property
     def availability(self):
-        isSale = self.saleitem == 1
-        isLimited = self.list_store_bonus == 1 or self.list_amiami_limited == 1
-        isPreowned = self.condition_flg == 1
-        isPreorder = self.preorderitem == 1
-        isBackorder = self.list_backorder_available == 1
-        isClosed = self.order_closed_flg == 1
-        
-        if isClosed:
-            if isPreorder:
-                return "Pre-order Closed"
-            elif isBackorder:
-                return "Back-order Closed"
-            else:
-                return "Order Closed"
-        else:
-            if isPreorder:
-                return "Pre-order"
-            elif isBackorder:
-                return "Back-order"
-            elif isPreowned:
-                return "Pre-owned"
-            elif isLimited:
-                return "Limited"
-            elif isSale:
-                return "On Sale"
-            else:
-                return "Available"
+        # computed on first access and kept in its slot
+        try:
+            return self._availability
+        except AttributeError:
+            self._availability = _availability_from_flags(self.flags)
+            return self._availability
 
     @property
     def flags(self):
@@ -114,6 +98,28 @@ class Item:
             "isClosed": self.order_closed_flg == 1,
         }
 
+def _availability_from_flags(flags):
+    if flags["isClosed"]:
+        if flags["isPreorder"]:
+            return "Pre-order Closed"
+        elif flags["isBackorder"]:
+            return "Back-order Closed"
+        else:
+            return "Order Closed"
+    else:
+        if flags["isPreorder"]:
+            return "Pre-order"
+        elif flags["isBackorder"]:
+            return "Back-order"
+        elif flags["isPreowned"]:
+            return "Pre-owned"
+        elif flags["isLimited"]:
+            return "Limited"
+        elif flags["isSale"]:
+            return "On Sale"
+        else:
+            return "Available"
+
 class ResultSet:
 
     def __init__(self, keyword, proxies = None):
@@ -146,10 +152,10 @@ class ResultSet:
     #     else:
     #         return None
 
-    def searchNextPage(self):
+    def _requestPage(self, pagecnt):
         data = {
             "s_keywords": self.keyword,
-            "pagecnt": self.currentPage + 1,
+            "pagecnt": pagecnt,
             "pagemax": PER_PAGE,
             "lang": "eng",
             "s_sortkey":"recommend",
@@ -163,23 +169,44 @@ class ResultSet:
             "X-User-Key": "amiami_dev",
             "User-Agent": "python-amiami_dev",
         }
-        resp = requests.get(rootURL, params=data, headers=headers, impersonate="chrome110", proxies=self.proxies)
-        self.__parse(resp.json())
+        with amiami_session() as session:
+            resp = session.get(rootURL, params=data, headers=headers, proxies=self.proxies)
+        return resp.json()
+
+    def searchNextPage(self):
+        self.__parse(self._requestPage(self.currentPage + 1))
         self.currentPage += 1
 
+    def searchRemainingPages(self, max_in_flight=MAX_IN_FLIGHT, max_pages=None):
+        """
+        Descarga en paralelo todas las páginas restantes de la búsqueda.
+
+        La primera página se pide de forma secuencial para conocer `pages`;
+        el resto se pide con un pool de hilos limitado a `max_in_flight`
+        peticiones simultáneas. Los resultados se agregan a `items` en orden
+        de página.
+
+        Args:
+            max_in_flight (int): Máximo de peticiones simultáneas
+            max_pages (int, optional): Última página a descargar (por defecto todas)
+        """
+        if not self.init:
+            self.searchNextPage()
+
+        last_page = self.pages if max_pages is None else min(self.pages, max_pages)
+        pending = range(self.currentPage + 1, last_page + 1)
+        if not pending:
+            return
+
+        with ThreadPoolExecutor(max_workers=max(1, max_in_flight)) as executor:
+            # map() devuelve los resultados en el orden de las páginas pedidas
+            for obj in executor.map(self._requestPage, pending):
+                self.__parse(obj)
+                self.currentPage += 1
 
     def __add(self, productInfo):
-        item = Item(productInfo)
-        
-        # Check for unknown status (debugging purposes)
-        if item.availability == "Unknown status?":
-            print("STATUS ERROR FOR {}: flags:{}, avail:{}".format(
-                item.gcode,
-                item.flags,
-                item.availability,
-            ))
-        
-        self.items.append(item)
+        # availability/flags are computed lazily, only when someone reads them
+        self.items.append(Item(productInfo))
 
     def __parse(self, obj):
         # returns true when done
@@ -201,9 +228,12 @@ class ResultSet:
 #     level=logging.DEBUG
 # )
 
-def search(keywords, proxies=None):
+def search(keywords, proxies=None, max_in_flight=1):
     rs = searchPaginated(keywords=keywords, proxies=proxies)
 
+    if max_in_flight > 1:
+        rs.searchRemainingPages(max_in_flight=max_in_flight)
+
     while rs.hasMore:
         rs.searchNextPage()
 
@@ -217,6 +247,58 @@ def searchPaginated(keywords, proxies=None):
     return rs
 
 
+def iter_search_pages(keywords, proxies=None, max_pages=None, prefetch=True):
+    """
+    Genera los Item de una búsqueda página a página, sin retener las
+    páginas ya consumidas (a diferencia de ResultSet.items).
+
+    Mientras se consume una página, la siguiente se descarga en un hilo en
+    segundo plano. Si el consumidor deja de iterar, no se piden más páginas.
+
+    Args:
+        keywords (str): Palabra clave a buscar
+        proxies (dict, optional): Configuración de proxies
+        max_pages (int, optional): Máximo de páginas a descargar
+        prefetch (bool): Descargar la siguiente página mientras se consume la actual
+
+    Yields:
+        list: Items de cada página, en orden
+    """
+    rs = ResultSet(keyword=keywords, proxies=proxies)
+    executor = ThreadPoolExecutor(max_workers=1) if prefetch else None
+
+    try:
+        pagecnt = 1
+        obj = rs._requestPage(pagecnt)
+        pages = int(ceil(obj['search_result']['total_results'] / float(PER_PAGE)))
+        if max_pages is not None:
+            pages = min(pages, max_pages)
+
+        while obj['items']:
+            next_page = None
+            if pagecnt < pages:
+                if executor is not None:
+                    next_page = executor.submit(rs._requestPage, pagecnt + 1)
+
+            yield [Item(productInfo) for productInfo in obj['items']]
+
+            if pagecnt >= pages:
+                break
+            pagecnt += 1
+            obj = next_page.result() if next_page is not None else rs._requestPage(pagecnt)
+    finally:
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+def iter_search(keywords, proxies=None, max_pages=None, prefetch=True):
+    """
+    Genera los Item de una búsqueda uno a uno (ver iter_search_pages).
+    """
+    for page_items in iter_search_pages(keywords, proxies=proxies, max_pages=max_pages, prefetch=prefetch):
+        yield from page_items
+
+
 def get_item_detail(gcode, proxies=None):
     """
     Obtiene información detallada de un producto específico usando su gcode.
@@ -241,7 +323,8 @@ def get_item_detail(gcode, proxies=None):
     }
     
     try:
-        resp = requests.get(item_url, params=params, headers=headers, impersonate="chrome110", proxies=proxies)
+        with amiami_session() as session:
+            resp = session.get(item_url, params=params, headers=headers, proxies=proxies)
         resp.raise_for_status()
         
         data = resp.json()
@@ -6,8 +6,13 @@ Maneja la obtención y actualización de productos específicos usando su gcode
 """
 
 import amiami
+import config
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
-from mongo_service import update_single_product
+from urllib.parse import urlparse
+from http_sessions import get_rate_limiter
+from mongo_service import get_mongo_service, update_single_product, ITEM_UPDATE_FIELDS
 
 
 def amiami_detail_to_standard(api_response: dict) -> dict:
@@ -206,48 +211,147 @@ def actualizar_producto_amiami(gcode: str, proxies=None):
         }
 
 
-def actualizar_productos_batch(gcodes: list, proxies=None):
+def obtener_detalle_estandar(gcode: str, proxies=None, limiter=None):
+    """
+    Descarga el detalle de un producto y lo convierte al formato estándar.
+    
+    Args:
+        gcode (str): Código del producto
+        proxies (dict, optional): Configuración de proxies
+        limiter (RateLimiter, optional): Limitador del host de la API
+    
+    Returns:
+        tuple: (respuesta de la API, producto estandarizado, error)
+    """
+    if limiter is not None:
+        limiter.wait()
+    
+    api_response = amiami.get_item_detail(gcode, proxies=proxies)
+    if not api_response:
+        return None, None, f"No se pudo obtener información del producto {gcode}"
+    
+    standardized_product = amiami_detail_to_standard(api_response)
+    if not standardized_product.get("id"):
+        return api_response, None, f"Error procesando datos del producto {gcode}"
+    
+    return api_response, standardized_product, None
+
+
+def guardar_lote(mongo, lote, productos_actualizados, errores_detalle):
+    """
+    Guarda un lote de productos con dos escrituras bulk: los logs
+    individuales y el upsert parcial de los productos.
+    
+    Args:
+        mongo (MongoService): Servicio de MongoDB del proceso
+        lote (list): Tuplas (gcode, respuesta de la API, producto estandarizado)
+        productos_actualizados (list): Acumulador de productos guardados
+        errores_detalle (list): Acumulador de errores
+    """
+    if not lote:
+        return
+    
+    try:
+        mongo.save_item_scraping_logs_batch(
+            source="amiami",
+            items=[{"product_id": gcode, "original_data": api_response} for gcode, api_response, _ in lote]
+        )
+        batch_result = mongo.upsert_products_batch(
+            [product for _, _, product in lote],
+            update_fields=ITEM_UPDATE_FIELDS,
+            record_changes=True
+        )
+    except Exception as e:
+        for gcode, _, _ in lote:
+            errores_detalle.append({"gcode": gcode, "error": f"Error guardando en MongoDB: {e}"})
+        return
+    
+    inserted_ids = set(batch_result["inserted_ids"])
+    failed = {error["product_id"]: error["error"] for error in batch_result["errors"]}
+    
+    for gcode, _, product in lote:
+        if product["id"] in failed:
+            errores_detalle.append({"gcode": gcode, "error": f"Error guardando en MongoDB: {failed[product['id']]}"})
+        else:
+            productos_actualizados.append({
+                "gcode": gcode,
+                "title": product.get("title", "Sin título"),
+                "price": product.get("price", "Sin precio"),
+                "operation": "inserted" if product["id"] in inserted_ids else "updated"
+            })
+
+
+def actualizar_productos_batch(gcodes: list, proxies=None,
+                               max_workers: int = config.amiami_detail_workers,
+                               write_batch_size: int = 100,
+                               progress_every: int = 25):
     """
     Actualiza múltiples productos de AmiAmi en batch.
     
+    Las peticiones de detalle se hacen en paralelo con un pool acotado y
+    respetando el límite de peticiones por segundo del host de la API
+    (config.host_rate_limits). Los resultados se escriben en MongoDB en
+    lotes bulk con un único MongoService compartido.
+    
     Args:
         gcodes (list): Lista de códigos de productos
         proxies (dict, optional): Configuración de proxies
+        max_workers (int): Peticiones de detalle simultáneas
+        write_batch_size (int): Productos por escritura bulk en MongoDB
+        progress_every (int): Cada cuántos productos se informa el progreso
     
     Returns:
         dict: Estadísticas de la operación
     """
-    print(f"🚀 Iniciando actualización batch de {len(gcodes)} productos AmiAmi")
+    total = len(gcodes)
+    print(f"🚀 Iniciando actualización batch de {total} productos AmiAmi ({max_workers} en paralelo)")
     
-    exitosos = 0
-    errores = 0
     productos_actualizados = []
     errores_detalle = []
+    lote = []
+    limiter = get_rate_limiter(urlparse(amiami.rootURL).netloc)
+    start_time = time.monotonic()
+    
+    mongo = get_mongo_service()
     
-    for i, gcode in enumerate(gcodes, 1):
-        print(f"\n📦 [{i}/{len(gcodes)}] Procesando {gcode}...")
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        futures = {
+            executor.submit(obtener_detalle_estandar, gcode, proxies, limiter): gcode
+            for gcode in gcodes
+        }
         
-        resultado = actualizar_producto_amiami(gcode, proxies=proxies)
+        for done, future in enumerate(as_completed(futures), 1):
+            gcode = futures[future]
+            try:
+                api_response, standardized_product, error = future.result()
+            except Exception as e:
+                api_response, standardized_product, error = None, None, str(e)
+            
+            if error:
+                errores_detalle.append({"gcode": gcode, "error": error})
+            else:
+                lote.append((gcode, api_response, standardized_product))
+            
+            if len(lote) >= write_batch_size:
+                guardar_lote(mongo, lote, productos_actualizados, errores_detalle)
+                lote = []
+            
+            if done % progress_every == 0 or done == total:
+                elapsed = time.monotonic() - start_time
+                rate = done / elapsed if elapsed else 0
+                remaining = (total - done) / rate if rate else 0
+                print(f"📦 [{done}/{total}] {rate:.1f} productos/s - restante estimado: {remaining:.0f}s")
         
-        if resultado["success"]:
-            exitosos += 1
-            productos_actualizados.append({
-                "gcode": gcode,
-                "title": resultado["product"].get("title", "Sin título"),
-                "price": resultado["product"].get("price", "Sin precio"),
-                "operation": resultado["mongo_result"]["product_result"]["operation"]
-            })
-        else:
-            errores += 1
-            errores_detalle.append({
-                "gcode": gcode,
-                "error": resultado.get("error", "Error desconocido")
-            })
+        guardar_lote(mongo, lote, productos_actualizados, errores_detalle)
+    
+    exitosos = len(productos_actualizados)
+    errores = len(errores_detalle)
     
     print(f"\n📊 Resumen de actualización batch:")
     print(f"   ✅ Exitosos: {exitosos}")
     print(f"   ❌ Errores: {errores}")
-    print(f"   📈 Total procesados: {len(gcodes)}")
+    print(f"   📈 Total procesados: {total}")
+    print(f"   ⏱️  Tiempo total: {time.monotonic() - start_time:.1f}s")
     
     if errores > 0:
         print(f"\n❌ Productos con errores:")
@@ -255,7 +359,7 @@ def actualizar_productos_batch(gcodes: list, proxies=None):
             print(f"   - {error['gcode']}: {error['error']}")
     
     return {
-        "total_procesados": len(gcodes),
+        "total_procesados": total,
         "exitosos": exitosos,
         "errores": errores,
         "productos_actualizados": productos_actualizados,
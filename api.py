@@ -1,19 +1,74 @@
 from fastapi import FastAPI, HTTPException, Query
-from typing import List, Dict, Any, Optional
-from datetime import datetime
+from fastapi.responses import StreamingResponse
+from typing import List, Dict, Any, Optional, Iterator
+from datetime import datetime, date, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+import asyncio
+import json
+import logging
+from itertools import islice
 import uvicorn
+import config
 
 # Importar funciones de scraping
-from hlj import scrape_all, hlj_to_standard
+from hlj import scrape_all, iter_pages
 import amiami
 from scrap_amiami import amiami_to_standard
+from amiami_single import actualizar_producto_amiami
+from search_cache import SearchCache, make_cache_key
+from mongo_service import get_mongo_service, save_scraping_data, PRODUCT_PUBLIC_PROJECTION
+
+logger = logging.getLogger(__name__)
+
+# Pool acotado donde se ejecutan los scrapers (bloqueantes) fuera del event loop
+scrape_executor = ThreadPoolExecutor(
+    max_workers=config.api_scrape_workers,
+    thread_name_prefix="scraper"
+)
+
+# Pool pequeño para lecturas de MongoDB (caché compartida, catálogo), separado
+# del de scraping para que una lectura nunca espere detrás de scrapes lentos
+read_executor = ThreadPoolExecutor(
+    max_workers=config.api_read_workers,
+    thread_name_prefix="reader"
+)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    scrape_executor.shutdown(wait=False, cancel_futures=True)
+    read_executor.shutdown(wait=False, cancel_futures=True)
 
 app = FastAPI(
     title="Product Scraper API",
     description="API para buscar productos de figuras en diferentes sitios web",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
+# Caché de resultados de /search (TTL + LRU, opcionalmente compartida en MongoDB)
+search_cache = SearchCache()
+
+# Scrapes y refrescos en curso por clave; peticiones idénticas simultáneas comparten el mismo
+in_flight_searches: Dict[Any, asyncio.Task] = {}
+
+async def run_blocking(func, *args):
+    """
+    Ejecuta una función bloqueante (scrapers) en el pool de scraping
+    sin bloquear el event loop
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(scrape_executor, func, *args)
+
+async def run_read(func, *args):
+    """
+    Ejecuta una lectura bloqueante de MongoDB en el pool de lecturas
+    sin bloquear el event loop
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(read_executor, func, *args)
+
 @app.get("/")
 async def root():
     """Endpoint raíz con información de la API"""
@@ -22,7 +77,12 @@ async def root():
         "version": "1.0.0",
         "available_sites": ["hlj", "amiami"],
         "endpoints": {
-            "search": "/search?keyword=evangelion&site=hlj&limit=10"
+            "search": "/search?keyword=evangelion&site=hlj&limit=10",
+            "search_all_sites": "/search?keyword=evangelion&site=all&limit=10",
+            "search_swr": "/search?keyword=evangelion&site=amiami&limit=10&freshness=swr",
+            "search_stream": "/search/stream?keyword=evangelion&site=amiami&limit=50&format=ndjson",
+            "products": "/products?source=amiami&in_stock=true&price_max=10000&limit=20",
+            "product": "/products/FIGURE-123456"
         }
     }
 
@@ -34,11 +94,9 @@ def scrape_hlj_products(keyword: str, limit: int) -> List[Dict[str, Any]]:
         # Calcular número de páginas necesarias (aproximadamente 30 productos por página)
         pages_needed = max(1, (limit + 29) // 30)  # Redondear hacia arriba
         
-        # Scraper HLJ con delay reducido para la API
-        products = scrape_all(keyword, pages=pages_needed, delay=0.5)
-        
-        # Convertir al formato estándar
-        standard_products = [hlj_to_standard(item) for item in products]
+        # Scraper HLJ con páginas en paralelo (ritmo limitado por config.host_rate_limits);
+        # el parseo y la conversión al formato estándar se hacen en el pool de procesos
+        standard_products = scrape_all(keyword, pages=pages_needed, standardize=True)
         
         # Limitar el número de resultados
         return standard_products[:limit]
@@ -46,6 +104,12 @@ def scrape_hlj_products(keyword: str, limit: int) -> List[Dict[str, Any]]:
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error scraping HLJ: {str(e)}")
 
+def amiami_item_to_standard(item: amiami.Item) -> Dict[str, Any]:
+    """
+    Convierte un amiami.Item al formato estándar
+    """
+    return amiami_to_standard(item.to_dict())
+
 def scrape_amiami_products(keyword: str, limit: int) -> List[Dict[str, Any]]:
     """
     Busca productos en AmiAmi y los convierte al formato estándar
@@ -54,69 +118,423 @@ def scrape_amiami_products(keyword: str, limit: int) -> List[Dict[str, Any]]:
         # Usar búsqueda paginada de AmiAmi
         results = amiami.searchPaginated(keyword)
         
+        # Descargar en paralelo el resto de páginas necesarias para el límite
+        pages_needed = max(1, (limit + amiami.PER_PAGE - 1) // amiami.PER_PAGE)
+        if results.hasMore and pages_needed > 1:
+            results.searchRemainingPages(max_pages=pages_needed)
+        
         all_products = []
         
-        # Recopilar productos hasta alcanzar el límite
-        while len(all_products) < limit and results.hasMore:
-            for item in results.items:
-                if len(all_products) >= limit:
-                    break
-                    
-                # Obtener todos los atributos del objeto item
-                product_data = {}
-                for attr_name in dir(item):
-                    if not attr_name.startswith('_') and not callable(getattr(item, attr_name)):
-                        try:
-                            attr_value = getattr(item, attr_name)
-                            product_data[attr_name] = attr_value
-                        except Exception:
-                            pass
-                
-                # Convertir al formato estándar
-                standard_product = amiami_to_standard(product_data)
-                all_products.append(standard_product)
-            
-            # Cargar siguiente página si necesitamos más productos
-            if len(all_products) < limit and results.hasMore:
-                results.searchNextPage()
+        for item in results.items[:limit]:
+            all_products.append(amiami_item_to_standard(item))
         
         return all_products[:limit]
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error scraping AmiAmi: {str(e)}")
 
+def stream_hlj_products(keyword: str, limit: int) -> Iterator[Dict[str, Any]]:
+    """
+    Genera productos de HLJ en formato estándar a medida que se parsea cada página
+    """
+    pages_needed = max(1, (limit + 29) // 30)
+    count = 0
+    
+    for page_products in iter_pages(keyword, pages=pages_needed, standardize=True):
+        for product in page_products:
+            yield product
+            count += 1
+            if count >= limit:
+                return
+
+def stream_amiami_products(keyword: str, limit: int) -> Iterator[Dict[str, Any]]:
+    """
+    Genera productos de AmiAmi en formato estándar a medida que llega cada página
+    """
+    pages_needed = max(1, (limit + amiami.PER_PAGE - 1) // amiami.PER_PAGE)
+    
+    # iter_search descarga la siguiente página mientras se emite la actual
+    # y no retiene las páginas ya enviadas
+    items = amiami.iter_search(keyword, max_pages=pages_needed)
+    for item in islice(items, limit):
+        yield amiami_item_to_standard(item)
+
+SCRAPERS = {
+    "hlj": scrape_hlj_products,
+    "amiami": scrape_amiami_products,
+}
+
+STREAMERS = {
+    "hlj": stream_hlj_products,
+    "amiami": stream_amiami_products,
+}
+
+def scrape_and_cache(cache_key, keyword: str) -> List[Dict[str, Any]]:
+    """
+    Scrapea el bucket completo de la clave (para que límites menores
+    reutilicen la entrada) y guarda el resultado en la caché
+    """
+    site, _, scrape_limit = cache_key
+    products = SCRAPERS[site](keyword, scrape_limit)
+    search_cache.set(cache_key, products)
+    return products
+
+def refresh_pages(scrape_limit: int) -> int:
+    """Páginas de 30 productos que cubre un bucket de límite"""
+    return max(1, (scrape_limit + 29) // 30)
+
+def refresh_stored_products(cache_key, keyword: str) -> List[Dict[str, Any]]:
+    """
+    Scrapea la clave como scrape_and_cache y además guarda los productos en
+    neko_products, de donde los lee el modo swr de /search. El log de
+    scraping se guarda con la keyword normalizada, las páginas del bucket y
+    los IDs devueltos, y es lo que registra cuándo se refrescó la clave por
+    última vez y con qué resultado.
+    """
+    products = scrape_and_cache(cache_key, keyword)
+    site, normalized_keyword, scrape_limit = cache_key
+    try:
+        # Escritura completa (no incremental) para que updated_at marque
+        # también los productos sin cambios como recién verificados. Se
+        # pasan copias: products es el mismo objeto guardado en la caché
+        stored = [dict(product) for product in products]
+        save_scraping_data(
+            site, normalized_keyword, stored, stored,
+            pages_processed=refresh_pages(scrape_limit),
+            store_raw_data=False,
+            record_product_ids=True
+        )
+    except Exception as e:
+        logger.warning(f"No se pudieron guardar los productos de {site} - {keyword}: {e}")
+    return products
+
+def finish_flight(flight_key, task: asyncio.Task):
+    """Quita la tarea de las ejecuciones en curso y registra su error, si lo hubo"""
+    in_flight_searches.pop(flight_key, None)
+    if not task.cancelled() and task.exception() is not None:
+        logger.warning(f"Error en {flight_key}: {task.exception()}")
+
+def start_flight(flight_key, func, *args):
+    """
+    Ejecuta func(*args) en el pool salvo que ya haya una ejecución en curso
+    con la misma clave, en cuyo caso se reutiliza. La tarea sigue aunque
+    nadie la espere (refrescos en segundo plano).
+    
+    Returns:
+        tuple: (tarea, True si se reutilizó una ejecución en curso)
+    """
+    task = in_flight_searches.get(flight_key)
+    if task is not None:
+        return task, True
+    
+    task = asyncio.ensure_future(run_blocking(func, *args))
+    in_flight_searches[flight_key] = task
+    task.add_done_callback(lambda done: finish_flight(flight_key, done))
+    return task, False
+
+async def single_flight(cache_key, keyword: str):
+    """
+    Ejecuta scrape_and_cache una sola vez por clave: si ya hay un scrape
+    idéntico en curso, espera su resultado en lugar de lanzar otro.
+    
+    Returns:
+        tuple: (productos, True si se reutilizó un scrape en curso)
+    """
+    task, coalesced = start_flight(cache_key, scrape_and_cache, cache_key, keyword)
+    
+    # shield: si un cliente se desconecta, el scrape sigue para el resto
+    products = await asyncio.shield(task)
+    return products, coalesced
+
+def parse_sites(site: str) -> List[str]:
+    """
+    Convierte el parámetro site en la lista de sitios a consultar.
+    Acepta un sitio, una lista separada por comas o "all".
+    """
+    if site.lower() == "all":
+        return list(SCRAPERS)
+    
+    sites = []
+    for name in site.lower().split(","):
+        name = name.strip()
+        if name and name not in sites:
+            sites.append(name)
+    
+    if not sites or any(name not in SCRAPERS for name in sites):
+        raise HTTPException(
+            status_code=400, 
+            detail="Site must be 'hlj', 'amiami', 'all' or a comma-separated list of them"
+        )
+    return sites
+
+async def search_site(site: str, keyword: str, limit: int):
+    """
+    Busca en un sitio usando la caché y el scrape compartido.
+    
+    Returns:
+        tuple: (productos, metadata del sitio)
+    """
+    start_time = datetime.now()
+    cache_key = make_cache_key(site, keyword, limit)
+    
+    # La caché en memoria se consulta en el event loop; solo la compartida
+    # (MongoDB) pasa por el pool de lecturas
+    cached = search_cache.get_local(cache_key)
+    if cached is None and search_cache.shared:
+        cached = await run_read(search_cache.get_shared, cache_key)
+    
+    if cached is not None:
+        products, cache_age = cached
+        cache_hit = True
+        coalesced = False
+    else:
+        products, coalesced = await single_flight(cache_key, keyword)
+        cache_age = 0.0
+        cache_hit = False
+    
+    products = products[:limit]
+    processing_time = (datetime.now() - start_time).total_seconds()
+    
+    return products, {
+        "actual_count": len(products),
+        "processing_time_seconds": round(processing_time, 2),
+        "coalesced": coalesced,
+        "cache": {
+            "hit": cache_hit,
+            "age_seconds": round(cache_age, 1),
+            "ttl_seconds": search_cache.ttl_seconds,
+            "backend": search_cache.backend
+        }
+    }
+
+def catalog_product(product: Dict[str, Any]) -> Dict[str, Any]:
+    """Quita el _id interno de MongoDB de un producto del catálogo"""
+    product.pop("_id", None)
+    return product
+
+def seconds_since(timestamp: Optional[datetime]) -> float:
+    """Segundos transcurridos desde timestamp (infinito si no hay fecha)"""
+    if timestamp is None:
+        return float("inf")
+    return (datetime.now() - timestamp).total_seconds()
+
+def product_age(product: Dict[str, Any]) -> float:
+    """
+    Segundos desde la última vez que se verificó el producto. Los crawls
+    incrementales no tocan updated_at si nada cambió, así que se usa
+    last_seen_at (updated_at en productos guardados antes de existir)
+    """
+    return seconds_since(product.get("last_seen_at") or product.get("updated_at"))
+
+def freshness_metadata(served_from: str, age: float, refreshing: bool) -> Dict[str, Any]:
+    """Metadata de frescura de una respuesta servida desde el catálogo o en vivo"""
+    return {
+        "served_from": served_from,
+        "age_seconds": round(age, 1) if age != float("inf") else None,
+        "stale": age > config.freshness_soft_age,
+        "refreshing": refreshing,
+        "soft_age_seconds": config.freshness_soft_age,
+        "hard_age_seconds": config.freshness_hard_age
+    }
+
+def load_stored_products(cache_key, keyword: str, limit: int):
+    """
+    Productos guardados que coinciden con la keyword y fecha del último
+    refresco de la clave que cubrió al menos su bucket de límite
+    """
+    site, normalized_keyword, scrape_limit = cache_key
+    mongo = get_mongo_service()
+    products = mongo.search_stored_products(site, keyword, limit)
+    last_scrape = mongo.get_last_scrape(site, normalized_keyword, refresh_pages(scrape_limit))
+    if last_scrape is None:
+        return products, None
+    
+    if not products and last_scrape.get("product_ids"):
+        # La keyword no coincide palabra por palabra con los títulos (japonés,
+        # fabricante, serie...): se sirven los productos del último refresco
+        products = mongo.get_products_by_ids(last_scrape["product_ids"][:limit],
+                                             PRODUCT_PUBLIC_PROJECTION)
+    return products, last_scrape["timestamp"]
+
+def load_stored_product(product_id: str) -> Optional[Dict[str, Any]]:
+    return get_mongo_service().get_product_by_id(product_id, PRODUCT_PUBLIC_PROJECTION)
+
+async def search_site_swr(site: str, keyword: str, limit: int):
+    """
+    Busca en un sitio en modo stale-while-revalidate: sirve los productos
+    guardados en neko_products si el último refresco de la clave no supera
+    la edad máxima (freshness_hard_age) y, si supera la edad blanda
+    (freshness_soft_age), la refresca en segundo plano. Si no hay productos
+    guardados o la clave no se refrescó a tiempo, espera a un scrape en
+    vivo que también los guarda.
+    
+    La edad es la del refresco y no la de los productos: los que la tienda
+    ya no devuelve conservan su updated_at y marcarían la clave como
+    vencida para siempre.
+    
+    Returns:
+        tuple: (productos, metadata del sitio)
+    """
+    start_time = datetime.now()
+    cache_key = make_cache_key(site, keyword, limit)
+    refresh_key = ("refresh",) + cache_key
+    
+    try:
+        stored, refreshed_at = await run_read(load_stored_products, cache_key, keyword, limit)
+    except Exception as e:
+        logger.warning(f"Catálogo no disponible, se scrapea en vivo: {e}")
+        stored, refreshed_at = [], None
+    
+    age = seconds_since(refreshed_at)
+    coalesced = False
+    
+    if stored and age <= config.freshness_hard_age:
+        refreshing = age > config.freshness_soft_age
+        if refreshing:
+            start_flight(refresh_key, refresh_stored_products, cache_key, keyword)
+        products = [catalog_product(product) for product in stored]
+        served_from = "store"
+    else:
+        # Un scrape reciente de la clave (de cualquiera de los dos modos)
+        # sigue en la caché de búsquedas aunque el catálogo no lo refleje
+        cached = search_cache.get_local(cache_key)
+        if cached is None and search_cache.shared:
+            cached = await run_read(search_cache.get_shared, cache_key)
+        
+        if cached is not None:
+            products, age = cached
+            products = products[:limit]
+            served_from = "cache"
+            refreshing = age > config.freshness_soft_age
+            if refreshing:
+                start_flight(refresh_key, refresh_stored_products, cache_key, keyword)
+        else:
+            task, coalesced = start_flight(refresh_key, refresh_stored_products, cache_key, keyword)
+            products = (await asyncio.shield(task))[:limit]
+            served_from = "live"
+            age = 0.0
+            refreshing = False
+    
+    processing_time = (datetime.now() - start_time).total_seconds()
+    
+    return products, {
+        "actual_count": len(products),
+        "processing_time_seconds": round(processing_time, 2),
+        "coalesced": coalesced,
+        "freshness": freshness_metadata(served_from, age, refreshing)
+    }
+
+SEARCH_MODES = {
+    "live": search_site,
+    "swr": search_site_swr,
+}
+
+def merge_site_products(results: List[List[Dict[str, Any]]]):
+    """
+    Une los productos de varios sitios eliminando duplicados por jancode
+    (se conserva la primera aparición; productos sin jancode no se deduplican).
+    hlj_to_standard no tiene jancode, así que de momento solo se eliminan
+    duplicados entre productos de AmiAmi, no entre tiendas.
+    
+    Returns:
+        tuple: (productos unidos, número de duplicados eliminados)
+    """
+    merged = []
+    seen_jancodes = set()
+    duplicates = 0
+    
+    for products in results:
+        for product in products:
+            jancode = product.get("jancode")
+            if jancode:
+                if jancode in seen_jancodes:
+                    duplicates += 1
+                    continue
+                seen_jancodes.add(jancode)
+            merged.append(product)
+    
+    return merged, duplicates
+
 @app.get("/search")
 async def search_products(
     keyword: str = Query(..., description="Palabra clave para buscar productos"),
-    site: str = Query(..., description="Sitio web a buscar (hlj, amiami)"),
-    limit: int = Query(default=10, ge=1, le=100, description="Número máximo de productos a retornar (1-100)")
+    site: str = Query(..., description="Sitio web a buscar (hlj, amiami, all o lista separada por comas)"),
+    limit: int = Query(default=10, ge=1, le=100, description="Número máximo de productos a retornar por sitio (1-100)"),
+    freshness: str = Query(default="live", description="live (scrape con caché) o swr (catálogo guardado con refresco en segundo plano)")
 ):
     """
     Busca productos en el sitio especificado y retorna los resultados en formato estándar
     
+    Con freshness=swr se sirven los productos ya guardados en MongoDB
+    mientras no superen freshness_hard_age, refrescándolos en segundo plano
+    a partir de freshness_soft_age; la metadata de cada sitio incluye su
+    frescura.
+    
+    Con varios sitios ("all" o "hlj,amiami") las búsquedas se ejecutan en
+    paralelo, los productos se unen deduplicando por jancode y la metadata
+    incluye los tiempos de cada sitio.
+    
     Args:
         keyword: Palabra clave para la búsqueda (ej: "evangelion", "gundam")
-        site: Sitio web donde buscar ("hlj" o "amiami")
-        limit: Número máximo de productos a retornar (entre 1 y 100)
+        site: Sitio web donde buscar ("hlj", "amiami", "all" o "hlj,amiami")
+        limit: Número máximo de productos a retornar por sitio (entre 1 y 100)
+        freshness: Modo de frescura ("live" o "swr")
     
     Returns:
         JSON con metadata y lista de productos en formato estándar
     """
     
     # Validar sitio
-    if site.lower() not in ["hlj", "amiami"]:
+    sites = parse_sites(site)
+    
+    search = SEARCH_MODES.get(freshness.lower())
+    if search is None:
         raise HTTPException(
             status_code=400, 
-            detail="Site must be 'hlj' or 'amiami'"
+            detail="Freshness must be 'live' or 'swr'"
         )
     
     start_time = datetime.now()
     
     try:
-        if site.lower() == "hlj":
-            products = scrape_hlj_products(keyword, limit)
-        elif site.lower() == "amiami":
-            products = scrape_amiami_products(keyword, limit)
+        if len(sites) == 1:
+            products, site_metadata = await search(sites[0], keyword, limit)
+            
+            return {
+                "metadata": {
+                    "search_keyword": keyword,
+                    "site": sites[0],
+                    "requested_limit": limit,
+                    "freshness_mode": freshness.lower(),
+                    "timestamp": start_time.isoformat(),
+                    **site_metadata
+                },
+                "products": products
+            }
+        
+        results = await asyncio.gather(
+            *[search(name, keyword, limit) for name in sites],
+            return_exceptions=True
+        )
+        
+        sites_metadata = {}
+        site_products = []
+        for name, result in zip(sites, results):
+            if isinstance(result, BaseException):
+                error = result.detail if isinstance(result, HTTPException) else str(result)
+                sites_metadata[name] = {"error": error}
+                continue
+            products, site_metadata = result
+            site_products.append(products)
+            sites_metadata[name] = site_metadata
+        
+        if not site_products:
+            raise HTTPException(
+                status_code=500,
+                detail={"message": "All sites failed", "sites": sites_metadata}
+            )
+        
+        products, duplicates = merge_site_products(site_products)
         
         end_time = datetime.now()
         processing_time = (end_time - start_time).total_seconds()
@@ -124,11 +542,14 @@ async def search_products(
         return {
             "metadata": {
                 "search_keyword": keyword,
-                "site": site.lower(),
+                "site": ",".join(sites),
                 "requested_limit": limit,
+                "freshness_mode": freshness.lower(),
                 "actual_count": len(products),
+                "duplicates_removed": duplicates,
                 "timestamp": start_time.isoformat(),
-                "processing_time_seconds": round(processing_time, 2)
+                "processing_time_seconds": round(processing_time, 2),
+                "sites": sites_metadata
             },
             "products": products
         }
@@ -138,6 +559,208 @@ async def search_products(
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Unexpected error: {str(e)}")
 
+def format_stream_event(event: str, data: Dict[str, Any], stream_format: str) -> str:
+    """Serializa un evento como línea NDJSON o como evento SSE"""
+    payload = json.dumps(data, ensure_ascii=False, default=str)
+    if stream_format == "sse":
+        return f"event: {event}\ndata: {payload}\n\n"
+    if event == "product":
+        return payload + "\n"
+    return json.dumps({event: data}, ensure_ascii=False, default=str) + "\n"
+
+def stream_search(sites: List[str], keyword: str, limit: int, stream_format: str) -> Iterator[str]:
+    """
+    Recorre los sitios en orden emitiendo cada producto en cuanto se parsea.
+    Los errores se emiten como evento porque la respuesta ya está en curso.
+    """
+    start_time = datetime.now()
+    seen_jancodes = set()
+    counts = {}
+    
+    for site_name in sites:
+        counts[site_name] = 0
+        try:
+            for product in STREAMERS[site_name](keyword, limit):
+                jancode = product.get("jancode")
+                if jancode:
+                    if jancode in seen_jancodes:
+                        continue
+                    seen_jancodes.add(jancode)
+                counts[site_name] += 1
+                yield format_stream_event("product", product, stream_format)
+        except Exception as e:
+            yield format_stream_event(
+                "error",
+                {"site": site_name, "detail": f"Error scraping {site_name}: {str(e)}"},
+                stream_format
+            )
+    
+    processing_time = (datetime.now() - start_time).total_seconds()
+    yield format_stream_event("end", {
+        "search_keyword": keyword,
+        "site": ",".join(sites),
+        "requested_limit": limit,
+        "actual_count": sum(counts.values()),
+        "counts_by_site": counts,
+        "timestamp": start_time.isoformat(),
+        "processing_time_seconds": round(processing_time, 2)
+    }, stream_format)
+
+@app.get("/search/stream")
+async def search_products_stream(
+    keyword: str = Query(..., description="Palabra clave para buscar productos"),
+    site: str = Query(..., description="Sitio web a buscar (hlj, amiami, all o lista separada por comas)"),
+    limit: int = Query(default=10, ge=1, le=100, description="Número máximo de productos a retornar por sitio (1-100)"),
+    format: str = Query(default="ndjson", description="Formato de la respuesta (ndjson o sse)")
+):
+    """
+    Versión en streaming de /search: emite cada producto en cuanto se parsea
+    su página, sin esperar a que termine el scraping completo.
+    
+    En NDJSON cada línea es un producto; los errores se emiten como
+    {"error": {...}} y la última línea es {"end": {...}} con el resumen.
+    En SSE se emiten eventos "product", "error" y "end".
+    """
+    sites = parse_sites(site)
+    
+    stream_format = format.lower()
+    if stream_format not in ["ndjson", "sse"]:
+        raise HTTPException(
+            status_code=400, 
+            detail="Format must be 'ndjson' or 'sse'"
+        )
+    
+    media_type = "text/event-stream" if stream_format == "sse" else "application/x-ndjson"
+    return StreamingResponse(
+        stream_search(sites, keyword, limit, stream_format),
+        media_type=media_type,
+        headers={"Cache-Control": "no-cache"}
+    )
+
+@app.get("/products")
+def list_products(
+    source: Optional[str] = Query(default=None, description="Sitio de origen (hlj o amiami)"),
+    availability: Optional[str] = Query(default=None, description="Disponibilidad exacta (ej: Pre-order)"),
+    in_stock: Optional[bool] = Query(default=None, description="Solo productos con o sin stock"),
+    release_from: Optional[date] = Query(default=None, description="Fecha de lanzamiento desde (YYYY-MM-DD, inclusive)"),
+    release_to: Optional[date] = Query(default=None, description="Fecha de lanzamiento hasta (YYYY-MM-DD, inclusive)"),
+    price_min: Optional[int] = Query(default=None, ge=0, description="Precio mínimo"),
+    price_max: Optional[int] = Query(default=None, ge=0, description="Precio máximo"),
+    cursor: Optional[str] = Query(default=None, description="next_cursor de la página anterior"),
+    limit: int = Query(default=50, ge=1, le=200, description="Número máximo de productos a retornar (1-200)")
+):
+    """
+    Consulta el catálogo guardado en MongoDB (neko_products) sin scrapear.
+    
+    Los productos se ordenan de los actualizados más recientemente a los
+    más antiguos; para la página siguiente se pasa el next_cursor de la
+    metadata en el parámetro cursor.
+    
+    Returns:
+        JSON con metadata (filtros, next_cursor) y lista de productos en formato estándar
+    """
+    if source is not None and source.lower() not in SCRAPERS:
+        raise HTTPException(
+            status_code=400, 
+            detail="Source must be 'hlj' or 'amiami'"
+        )
+    
+    start_time = datetime.now()
+    
+    try:
+        page = get_mongo_service().find_products(
+            source=source.lower() if source else None,
+            availability=availability,
+            in_stock=in_stock,
+            release_from=release_from.isoformat() if release_from else None,
+            release_to=(release_to + timedelta(days=1)).isoformat() if release_to else None,
+            price_min=price_min,
+            price_max=price_max,
+            limit=limit,
+            cursor=cursor
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error querying catalog: {str(e)}")
+    
+    products = [catalog_product(product) for product in page["items"]]
+    processing_time = (datetime.now() - start_time).total_seconds()
+    
+    return {
+        "metadata": {
+            "filters": {
+                "source": source,
+                "availability": availability,
+                "in_stock": in_stock,
+                "release_from": release_from,
+                "release_to": release_to,
+                "price_min": price_min,
+                "price_max": price_max
+            },
+            "requested_limit": limit,
+            "actual_count": len(products),
+            "next_cursor": page["next_cursor"],
+            "timestamp": start_time.isoformat(),
+            "processing_time_seconds": round(processing_time, 3)
+        },
+        "products": products
+    }
+
+@app.get("/products/{product_id}")
+async def get_product(product_id: str):
+    """
+    Retorna un producto del catálogo guardado en MongoDB por su id
+    (gcode en AmiAmi, SKU en HLJ)
+    
+    Los productos de AmiAmi más antiguos que freshness_soft_age se
+    actualizan en segundo plano con actualizar_producto_amiami; si superan
+    freshness_hard_age se espera a la actualización antes de responder.
+    """
+    start_time = datetime.now()
+    
+    try:
+        product = await run_read(load_stored_product, product_id)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error querying catalog: {str(e)}")
+    
+    if product is None:
+        raise HTTPException(status_code=404, detail=f"Product '{product_id}' not found")
+    
+    age = product_age(product)
+    served_from = "store"
+    refreshing = False
+    
+    if product.get("source") == "amiami" and age > config.freshness_soft_age:
+        task, _ = start_flight(("product", product_id), actualizar_producto_amiami, product_id)
+        
+        if age <= config.freshness_hard_age:
+            refreshing = True
+        else:
+            try:
+                result = await asyncio.shield(task)
+                refreshed = await run_read(load_stored_product, product_id) if result.get("success") else None
+            except Exception as e:
+                logger.warning(f"No se pudo actualizar {product_id}: {e}")
+                refreshed = None
+            
+            # Si la actualización falla se sirve el producto guardado, marcado como stale
+            if refreshed is not None:
+                product = refreshed
+                age = product_age(product)
+                served_from = "live"
+    
+    processing_time = (datetime.now() - start_time).total_seconds()
+    
+    return {
+        "metadata": {
+            "timestamp": start_time.isoformat(),
+            "processing_time_seconds": round(processing_time, 3),
+            "freshness": freshness_metadata(served_from, age, refreshing)
+        },
+        "product": catalog_product(product)
+    }
+
 @app.get("/sites")
 async def get_available_sites():
     """
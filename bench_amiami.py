@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Microbenchmark de serialización de amiami.Item
+
+Compara, sobre filas sintéticas de la API, la serialización antigua por
+reflexión (dir() + getattr) con Item.to_dict(), tanto sola como seguida de
+amiami_to_standard, y los bytes por item de la representación con __dict__
+frente a la actual con __slots__.
+
+Uso:
+    python bench_amiami.py --items 10000
+"""
+
+import argparse
+import random
+import time
+import tracemalloc
+
+import amiami
+from scrap_amiami import amiami_to_standard
+
+
+def synthetic_rows(count, seed=42):
+    """Genera filas con la misma forma que la respuesta de /api/v1.0/items"""
+    rng = random.Random(seed)
+    rows = []
+    for i in range(count):
+        row = {field: None for field in amiami.ITEM_FIELDS}
+        row.update({
+            "gcode": f"FIGURE-{100000 + i}",
+            "gname": f"Synthetic Figure {i}",
+            "thumb_url": f"/images/product/thumb300/{i}.jpg",
+            "min_price": rng.randint(1000, 30000),
+            "max_price": rng.randint(1000, 30000),
+            "maker_name": "Maker",
+            "releasedate": "2025-03-01 00:00:00",
+            "jancode": str(4580000000000 + i),
+        })
+        for flag in ("saleitem", "condition_flg", "preorderitem", "list_backorder_available",
+                     "list_store_bonus", "list_amiami_limited", "order_closed_flg", "instock_flg"):
+            row[flag] = rng.randint(0, 1)
+        rows.append(row)
+    return rows
+
+
+def reflection_to_dict(item):
+    """Serialización anterior basada en dir()/getattr"""
+    product_data = {}
+    for attr_name in dir(item):
+        if not attr_name.startswith('_') and not callable(getattr(item, attr_name)):
+            try:
+                product_data[attr_name] = getattr(item, attr_name)
+            except Exception:
+                pass
+    return product_data
+
+
+class DictItem:
+    """Representación anterior de amiami.Item: atributos en un __dict__ por instancia"""
+
+    def __init__(self, api_data):
+        for field in amiami.ITEM_FIELDS:
+            setattr(self, field, api_data.get(field))
+
+
+def bytes_per_item(cls, rows):
+    """Bytes asignados por item al construir y retener todos los items"""
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    items = [cls(row) for row in rows]
+    allocated = tracemalloc.get_traced_memory()[0] - baseline
+    tracemalloc.stop()
+    del items
+    return allocated / len(rows)
+
+
+def bench(label, func, items, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for item in items:
+            func(item)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    per_item_us = best / len(items) * 1e6
+    print(f"   {label:<40} {best * 1000:8.1f}ms total  {per_item_us:6.2f}µs/item")
+    return per_item_us
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Microbenchmark de serialización de amiami.Item")
+    parser.add_argument("--items", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    items = [amiami.Item(row) for row in synthetic_rows(args.items)]
+
+    # Ambas rutas deben producir exactamente el mismo dict
+    for item in items[:100]:
+        assert reflection_to_dict(item) == item.to_dict()
+
+    print(f"📊 Serialización de {args.items} items (mejor de {args.repeat})")
+    old = bench("dir() + getattr", reflection_to_dict, items, args.repeat)
+    new = bench("Item.to_dict()", amiami.Item.to_dict, items, args.repeat)
+    old_std = bench("dir() + getattr + amiami_to_standard",
+                    lambda item: amiami_to_standard(reflection_to_dict(item)), items, args.repeat)
+    new_std = bench("to_dict() + amiami_to_standard",
+                    lambda item: amiami_to_standard(item.to_dict()), items, args.repeat)
+
+    print(f"\n   Aceleración serialización: x{old / new:.1f}")
+    print(f"   Aceleración con estandarización: x{old_std / new_std:.1f}")
+
+    rows = synthetic_rows(args.items)
+    dict_bytes = bytes_per_item(DictItem, rows)
+    slots_bytes = bytes_per_item(amiami.Item, rows)
+    print(f"\n📊 Memoria retenida por item ({args.items} items, sin contar los valores compartidos)")
+    print(f"   __dict__: {dict_bytes:8.0f} bytes/item")
+    print(f"   __slots__: {slots_bytes:7.0f} bytes/item")
+    print(f"   Reducción: {(1 - slots_bytes / dict_bytes) * 100:.0f}%")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark de los backends de parseo de HLJ
+
+Parsea las páginas de búsqueda guardadas en fixtures/ con cada backend de
+hlj.PARSER_BACKENDS, comprueba que todos producen exactamente los mismos
+productos y token CSRF que html.parser y mide las páginas por segundo en
+un solo núcleo. También mide el coste de CPU por tarjeta de la extracción
+anterior (selectores CSS como texto y búsqueda del SKU entre todos los
+elementos con id) frente a hlj.parse_card, y cómo escala el parseo en un
+pool de procesos (como el de hlj.get_parse_pool) con 1, 2, 4... procesos.
+
+Las páginas de fixtures/ son sintéticas (construidas a mano con la
+estructura de las tarjetas de HLJ), no capturas reales: la equivalencia de
+los backends de lxml con html.parser no está verificada con HTML real, por
+eso config.hlj_parser_backend usa "strainer" y lxml es opcional.
+
+Uso:
+    python bench_hlj.py --repeat 50 --pages 200
+"""
+
+import argparse
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from bs4 import BeautifulSoup
+
+import config
+import hlj
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+FIXTURES = ["hlj_search_page.html", "hlj_search_empty.html"]
+REFERENCE_BACKEND = "html.parser"
+
+
+def load_fixtures():
+    pages = {}
+    for name in FIXTURES:
+        with open(os.path.join(FIXTURES_DIR, name), encoding="utf-8") as f:
+            pages[name] = f.read()
+    return pages
+
+
+def available_backends():
+    """Backends de PARSER_BACKENDS cuyo tree builder está instalado"""
+    backends = []
+    for backend in hlj.PARSER_BACKENDS:
+        try:
+            hlj.parse_search_html("<html></html>", backend=backend)
+        except Exception as e:
+            print(f"   ⚠️  {backend} no disponible: {e}")
+            continue
+        backends.append(backend)
+    return backends
+
+
+def check_output(pages, backends):
+    """Todos los backends deben producir la misma salida que el de referencia"""
+    for name, html in pages.items():
+        expected = hlj.parse_search_html(html, backend=REFERENCE_BACKEND)
+        for backend in backends:
+            assert hlj.parse_search_html(html, backend=backend) == expected, \
+                f"{backend} difiere de {REFERENCE_BACKEND} en {name}"
+        print(f"   ✅ {name}: {len(expected[0])} productos, salida idéntica en {len(backends)} backends")
+
+
+def bench(backend, html, repeat):
+    best = None
+    for _ in range(3):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            hlj.parse_search_html(html, backend=backend)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    pages_per_second = repeat / best
+    print(f"   {backend:<16} {best * 1000 / repeat:7.2f}ms/página  {pages_per_second:7.1f} páginas/s por núcleo")
+    return pages_per_second
+
+
+def legacy_parse_card(card):
+    """Extracción anterior de una tarjeta, tal como estaba en parse_page"""
+    title_el = card.select_one("p.product-item-name a")
+    img_el = card.select_one("a.item-img-wrapper img")
+    link_el = card.select_one("a.item-img-wrapper")
+
+    sku = None
+    for element in card.find_all(attrs={"id": True}):
+        try:
+            if hasattr(element, 'get') and hasattr(element, 'name'):
+                element_id = element.get("id")
+                if isinstance(element_id, str) and "_" in element_id:
+                    potential_sku = element_id.split("_")[0]
+                    if len(potential_sku) > 3:
+                        sku = potential_sku
+                        break
+        except (KeyError, TypeError, AttributeError):
+            continue
+
+    title = title_el.text.strip() if title_el else None
+    link = link_el["href"] if link_el else None
+    img = img_el["src"] if img_el else None
+
+    if not (title and sku):
+        return None
+    return {"sku": sku, "title": title, "url": link, "image": img, "price": None, "release_date": None}
+
+
+def bench_cards(html, repeat):
+    """µs de CPU por tarjeta de la extracción anterior frente a hlj.parse_card"""
+    cards = hlj.CARD_SELECTOR.select(BeautifulSoup(html, "html.parser"))
+    for card in cards:
+        assert legacy_parse_card(card) == hlj.parse_card(card)
+
+    results = {}
+    for label, func in (("selectores como texto", legacy_parse_card), ("hlj.parse_card", hlj.parse_card)):
+        best = None
+        for _ in range(3):
+            start = time.process_time()
+            for _ in range(repeat):
+                for card in cards:
+                    func(card)
+            elapsed = time.process_time() - start
+            best = elapsed if best is None else min(best, elapsed)
+        results[label] = best / (repeat * len(cards)) * 1e6
+        print(f"   {label:<24} {results[label]:7.1f}µs/tarjeta")
+    return results
+
+
+def bench_processes(html, pages, max_workers):
+    """Páginas por segundo parseando en un pool de procesos de distintos tamaños"""
+    results = {}
+    workers = 1
+    while workers <= max_workers:
+        with ProcessPoolExecutor(max_workers=workers,
+                                 mp_context=multiprocessing.get_context("spawn")) as pool:
+            # Arrancar los procesos antes de medir
+            list(pool.map(hlj.parse_search_html, [html] * workers))
+            start = time.perf_counter()
+            list(pool.map(hlj.parse_search_html, [html] * pages))
+            elapsed = time.perf_counter() - start
+        results[workers] = pages / elapsed
+        print(f"   {workers:2d} procesos  {results[workers]:7.1f} páginas/s  x{results[workers] / results[1]:.1f}")
+        workers *= 2
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de los backends de parseo de HLJ")
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--pages", type=int, default=200, help="Páginas a parsear en el benchmark de procesos")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Procesos máximos")
+    args = parser.parse_args()
+
+    pages = load_fixtures()
+    backends = available_backends()
+
+    print("📋 Comprobando salida con las páginas guardadas")
+    check_output(pages, backends)
+
+    html = pages["hlj_search_page.html"]
+    print(f"\n📊 Parseo de hlj_search_page.html ({len(html) // 1024} KB, mejor de 3 x {args.repeat})")
+    results = {backend: bench(backend, html, args.repeat) for backend in backends}
+
+    print()
+    for backend, pages_per_second in results.items():
+        if backend != REFERENCE_BACKEND:
+            print(f"   Aceleración {backend}: x{pages_per_second / results[REFERENCE_BACKEND]:.1f}")
+
+    print(f"\n📊 CPU por tarjeta ({len(hlj.CARD_SELECTOR.select(BeautifulSoup(html, 'html.parser')))} tarjetas, "
+          f"mejor de 3 x {args.repeat})")
+    card_results = bench_cards(html, args.repeat)
+    old_card, new_card = card_results.values()
+    print(f"   Reducción por tarjeta: {(1 - new_card / old_card) * 100:.0f}%")
+
+    print(f"\n📊 Parseo de {args.pages} páginas en un pool de procesos ({config.hlj_parser_backend}, "
+          f"{os.cpu_count()} núcleos)")
+    bench_processes(html, args.pages, args.workers)
+
+
+if __name__ == "__main__":
+    main()
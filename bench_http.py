@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark de sesiones HTTP reutilizables
+
+Levanta un servidor HTTPS local (certificado autofirmado generado con
+openssl) como sustituto de HLJ/AmiAmi y compara peticiones sueltas, que
+abren una conexión TCP+TLS nueva cada vez, con las sesiones con keep-alive
+de http_sessions. El servidor cuenta las conexiones aceptadas, que equivalen
+a los handshakes TLS realizados.
+
+Uso:
+    python bench_http.py --requests 200
+"""
+
+import argparse
+import os
+import ssl
+import subprocess
+import tempfile
+import threading
+import time
+import warnings
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+from curl_cffi import requests as curl_requests
+
+import http_sessions
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """Responde un JSON pequeño manteniendo la conexión abierta (HTTP/1.1)"""
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        body = b'{"items": [], "search_result": {"total_results": 0}}'
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class CountingServer(ThreadingHTTPServer):
+    daemon_threads = True
+    connections = 0
+
+    def get_request(self):
+        conn, addr = super().get_request()
+        self.connections += 1
+        return conn, addr
+
+
+def start_server(tmp_dir):
+    cert = os.path.join(tmp_dir, "cert.pem")
+    key = os.path.join(tmp_dir, "key.pem")
+    subprocess.run(
+        ["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1",
+         "-subj", "/CN=localhost", "-keyout", key, "-out", cert],
+        check=True, capture_output=True
+    )
+
+    server = CountingServer(("127.0.0.1", 0), StandInHandler)
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    context.load_cert_chain(cert, key)
+    server.socket = context.wrap_socket(server.socket, server_side=True)
+
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def run_case(label, server, func, count):
+    server.connections = 0
+    start = time.perf_counter()
+    for _ in range(count):
+        func()
+    elapsed = time.perf_counter() - start
+    print(f"   {label:<32} {elapsed * 1000 / count:7.2f}ms/petición  {server.connections:4d} handshakes")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de sesiones HTTP reutilizables")
+    parser.add_argument("--requests", type=int, default=200)
+    args = parser.parse_args()
+
+    warnings.filterwarnings("ignore")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        server = start_server(tmp_dir)
+        url = f"https://localhost:{server.server_address[1]}/api/v1.0/items"
+
+        print(f"📊 {args.requests} peticiones GET contra {url}")
+
+        old_hlj = run_case("requests.get", server,
+                           lambda: requests.get(url, verify=False, timeout=10), args.requests)
+        hlj_session = http_sessions.get_hlj_session()
+        new_hlj = run_case("get_hlj_session().get", server,
+                           lambda: hlj_session.get(url, verify=False, timeout=10), args.requests)
+
+        old_amiami = run_case("curl_cffi.requests.get", server,
+                              lambda: curl_requests.get(url, impersonate="chrome110", verify=False),
+                              args.requests)
+        def pooled_amiami_get():
+            # Como amiami.py: la sesión se toma del pool en cada petición
+            with http_sessions.amiami_session() as session:
+                session.get(url, verify=False)
+        
+        new_amiami = run_case("amiami_session().get", server, pooled_amiami_get, args.requests)
+
+        print(f"\n   Aceleración HLJ (requests): x{old_hlj / new_hlj:.1f}")
+        print(f"   Aceleración AmiAmi (curl_cffi): x{old_amiami / new_amiami:.1f}")
+
+        http_sessions.close_sessions()
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
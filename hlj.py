@@ -1,15 +1,63 @@
-import requests
-from bs4 import BeautifulSoup
-import time
+from bs4 import BeautifulSoup, SoupStrainer
+import soupsieve
+import atexit
 import json
+import multiprocessing
 import re
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from datetime import datetime
-from mongo_service import save_scraping_data
+import config
+from mongo_service import save_scraping_data, get_mongo_service
+from http_sessions import get_hlj_session, get_rate_limiter
 
 #BASE_URL = "https://www.hlj.com/search/?Word={}&page={}&GenreCode2=Action+Figures&GenreCode2=Figures&GenreCode2=Trading+Figures&StockLevel=All+Future+Release"
 BASE_URL = "https://www.hlj.com/search/?Word={}&page={}&GenreCode2=Action+Figures&GenreCode2=Figures&GenreCode2=Trading+Figures&StockLevel=In%C2%A0Stock"
 
 LIVE_PRICE_URL = "https://www.hlj.com/search/livePrice/"
+# Página de la que se obtiene un token CSRF cuando no hay uno en caché
+CSRF_PAGE_URL = "https://www.hlj.com/search/"
+HLJ_HOST = "www.hlj.com"
+
+# Backends de parseo del HTML de búsqueda: (tree builder de BeautifulSoup,
+# construir solo las tarjetas de producto con un SoupStrainer). Los de lxml son
+# opcionales (pip install lxml) y su equivalencia solo se comprobó con páginas
+# sintéticas; con strainer el token CSRF se busca en el HTML sin parsear.
+PARSER_BACKENDS = {
+    "html.parser": ("html.parser", False),
+    "strainer": ("html.parser", True),
+    "lxml": ("lxml", False),
+    "lxml-strainer": ("lxml", True),
+}
+# La clase se compara por palabras: en los strainers class_="..." exige el atributo exacto
+CARD_STRAINER = SoupStrainer(
+    "div", class_=lambda value: value is not None and "search-widget-block" in value.split()
+)
+
+# Plan de extracción compilado una sola vez al importar el módulo
+CSRF_TOKEN_PATTERN = re.compile(r"'csrfmiddlewaretoken':\s*'([^']+)'")
+CARD_SELECTOR = soupsieve.compile("div.search-widget-block")
+TITLE_SELECTOR = soupsieve.compile("p.product-item-name a")
+IMAGE_SELECTOR = soupsieve.compile("a.item-img-wrapper img")
+LINK_SELECTOR = soupsieve.compile("a.item-img-wrapper")
+# id "<SKU>_<sufijo>" con al menos 4 caracteres antes del primer "_" (SKUs suelen ser más largos)
+SKU_ID_PATTERN = re.compile(r"^[^_]{4,}_")
+
+# Campos que actualiza el refresco de solo precios (el resto no viene en livePrice)
+PRICE_UPDATE_FIELDS = ['price', 'currency', 'availability', 'in_stock', 'max_sale_qty', 'release_date']
+
+# Token CSRF compartido entre hilos, reutilizado hasta config.hlj_csrf_token_ttl
+_csrf_lock = threading.Lock()
+_csrf_token = None
+_csrf_expires_at = 0.0
+
+# Pool de procesos compartido para parsear el HTML (ver get_parse_pool)
+_parse_pool_lock = threading.Lock()
+_parse_pool = None
 
 headers = {
     "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64)"
@@ -22,70 +70,138 @@ def extract_csrf_token(soup):
         if script.string:
             script_text = script.string
             # Buscar el patrón 'csrfmiddlewaretoken': 'TOKEN'
-            csrf_match = re.search(r"'csrfmiddlewaretoken':\s*'([^']+)'", script_text)
+            csrf_match = CSRF_TOKEN_PATTERN.search(script_text)
             if csrf_match:
                 return csrf_match.group(1)
     return None
 
-def parse_page(keyword, page_num):
+def remember_csrf_token(token):
+    """Guarda en caché un token CSRF recién extraído de una página"""
+    global _csrf_token, _csrf_expires_at
+    if token:
+        with _csrf_lock:
+            _csrf_token = token
+            _csrf_expires_at = time.monotonic() + config.hlj_csrf_token_ttl
+
+def invalidate_csrf_token(token):
+    """Descarta el token en caché si es el que HLJ rechazó"""
+    global _csrf_token
+    with _csrf_lock:
+        if _csrf_token == token:
+            _csrf_token = None
+
+def get_csrf_token():
+    """
+    Retorna el token CSRF en caché o, si venció, descarga CSRF_PAGE_URL
+    para obtener uno nuevo
+    """
+    global _csrf_token, _csrf_expires_at
+    with _csrf_lock:
+        if _csrf_token and time.monotonic() < _csrf_expires_at:
+            return _csrf_token
+        
+        # Se descarga dentro del lock para que varios hilos no pidan la página a la vez
+        get_rate_limiter(HLJ_HOST).wait()
+        resp = get_hlj_session().get(CSRF_PAGE_URL, headers=headers, timeout=10)
+        resp.raise_for_status()
+        _csrf_token = extract_csrf_token(BeautifulSoup(resp.text, "html.parser"))
+        _csrf_expires_at = time.monotonic() + config.hlj_csrf_token_ttl
+        return _csrf_token
+
+def fetch_search_page(keyword, page_num):
+    """Descarga el HTML de una página de búsqueda respetando el límite de ritmo de HLJ"""
     url = BASE_URL.format(keyword, page_num)
-    resp = requests.get(url, headers=headers, timeout=10)
+    get_rate_limiter(HLJ_HOST).wait()
+    resp = get_hlj_session().get(url, headers=headers, timeout=10)
     resp.raise_for_status()
-    soup = BeautifulSoup(resp.text, "html.parser")
+    return resp.text
 
-    # Extraer token CSRF
-    csrf_token = extract_csrf_token(soup)
+def parse_search_html(html, backend=None):
+    """
+    Extrae los productos (sin precio) y el token CSRF de una página de búsqueda
+    
+    Args:
+        html: HTML de la página de búsqueda
+        backend: Clave de PARSER_BACKENDS (por defecto config.hlj_parser_backend)
+    
+    Returns:
+        tuple: (productos, token CSRF o None)
+    """
+    features, strain = PARSER_BACKENDS[backend or config.hlj_parser_backend]
+    
+    if strain:
+        # Solo se construye el árbol de las tarjetas; los <script> quedan fuera
+        soup = BeautifulSoup(html, features, parse_only=CARD_STRAINER)
+        csrf_match = CSRF_TOKEN_PATTERN.search(html)
+        csrf_token = csrf_match.group(1) if csrf_match else None
+    else:
+        soup = BeautifulSoup(html, features)
+        # Extraer token CSRF
+        csrf_token = extract_csrf_token(soup)
     
     products = []
-    item_codes = []
     
     # Primero extraemos la información básica y los códigos de producto
-    for card in soup.select("div.search-widget-block"):
-        title_el = card.select_one("p.product-item-name a")
-        img_el = card.select_one("a.item-img-wrapper img")
-        link_el = card.select_one("a.item-img-wrapper")
-        
-        # Extraer código de producto del ID o data attributes
-        sku = None
-        # Buscar en elementos con IDs que contengan códigos de producto
-        for element in card.find_all(attrs={"id": True}):
-            try:
-                # Verificar que sea un Tag (no NavigableString) antes de acceder atributos
-                if hasattr(element, 'get') and hasattr(element, 'name'):
-                    element_id = element.get("id")
-                    if isinstance(element_id, str) and "_" in element_id:
-                        # Extraer la parte antes del underscore como posible SKU
-                        potential_sku = element_id.split("_")[0]
-                        if len(potential_sku) > 3:  # SKUs suelen ser más largos
-                            sku = potential_sku
-                            break
-            except (KeyError, TypeError, AttributeError):
-                continue
-        
-        title = title_el.text.strip() if title_el else None
-        link = link_el["href"] if link_el else None
-        img = img_el["src"] if img_el else None
-
-        if title and sku:
-            products.append({
-                "sku": sku,
-                "title": title,
-                "url": link,
-                "image": img,
-                "price": None,
-                "release_date": None
-            })
-            item_codes.append(sku)
-
-    # Hacer petición a la API livePrice para obtener precios y fechas
-    if item_codes and csrf_token:
-        try:
+    for card in CARD_SELECTOR.select(soup):
+        product = parse_card(card)
+        if product:
+            products.append(product)
+
+    return products, csrf_token
+
+def parse_card(card):
+    """
+    Extrae la información básica de una tarjeta div.search-widget-block
+    
+    Returns:
+        dict: Producto sin precio, o None si la tarjeta no tiene título o SKU
+    """
+    title_el = TITLE_SELECTOR.select_one(card)
+    img_el = IMAGE_SELECTOR.select_one(card)
+    link_el = LINK_SELECTOR.select_one(card)
+    
+    # El SKU es la parte antes del "_" del primer elemento con un id "<SKU>_..."
+    sku_el = card.find(id=SKU_ID_PATTERN)
+    sku = sku_el["id"].split("_")[0] if sku_el else None
+    
+    title = title_el.text.strip() if title_el else None
+    link = link_el["href"] if link_el else None
+    img = img_el["src"] if img_el else None
+
+    if not (title and sku):
+        return None
+    
+    return {
+        "sku": sku,
+        "title": title,
+        "url": link,
+        "image": img,
+        "price": None,
+        "release_date": None
+    }
+
+def fetch_live_price_batch(item_codes, csrf_token=None):
+    """
+    Consulta la API livePrice para un lote de SKUs. Sin token se usa el de
+    la caché; si HLJ lo rechaza (403) se obtiene uno nuevo y se reintenta
+    una vez.
+    
+    Returns:
+        dict: Datos de livePrice por SKU (vacío si la petición falla)
+    """
+    try:
+        token = csrf_token or get_csrf_token()
+        for attempt in range(2):
+            if not token:
+                return {}
+            
             live_price_params = {
                 "item_codes": ",".join(item_codes),
-                "csrfmiddlewaretoken": csrf_token
+                "csrfmiddlewaretoken": token
             }
             
-            price_resp = requests.get(
+            get_rate_limiter(HLJ_HOST).wait()
+            price_resp = get_hlj_session().get(
                 LIVE_PRICE_URL,
                 params=live_price_params,
                 headers=headers,
@@ -93,33 +209,253 @@ def parse_page(keyword, page_num):
             )
             
             if price_resp.status_code == 200:
-                price_info = price_resp.json()
-                
-                # Actualizar productos con información de precios
-                for product in products:
-                    sku = product["sku"]
-                    if sku in price_info:
-                        item_data = price_info[sku]
-                        # Guardar todos los campos del liveprice response
-                        product.update(item_data)
-                        # Mantener los campos originales del scraping básico
-                        # (title, url, image se mantienen del scraping inicial)
-        except Exception as e:
-            print(f"Error obteniendo precios: {e}")
+                return price_resp.json()
+            if price_resp.status_code != 403 or attempt:
+                return {}
+            
+            print("Token CSRF rechazado, obteniendo uno nuevo…")
+            invalidate_csrf_token(token)
+            token = get_csrf_token()
+    except Exception as e:
+        print(f"Error obteniendo precios: {e}")
+    
+    return {}
 
+def fetch_live_prices(item_codes, csrf_token=None, batch_size=config.hlj_live_price_batch_size):
+    """
+    Consulta la API livePrice para obtener precios y fechas de los SKUs,
+    en lotes de hasta batch_size SKUs
+    
+    Returns:
+        dict: Datos de livePrice por SKU (los lotes fallidos se omiten)
+    """
+    price_info = {}
+    for start in range(0, len(item_codes), batch_size):
+        price_info.update(fetch_live_price_batch(item_codes[start:start + batch_size], csrf_token))
+    return price_info
+
+def apply_live_prices(products, price_info):
+    """Actualiza los productos con la información de precios de livePrice"""
+    for product in products:
+        sku = product["sku"]
+        if sku in price_info:
+            # Guardar todos los campos del liveprice response
+            # (title, url, image se mantienen del scraping inicial)
+            product.update(price_info[sku])
     return products
 
-def scrape_all(keyword, pages=5, delay=1.0):
+def parse_page(keyword, page_num):
+    """Descarga y parsea una página de búsqueda, con sus precios de livePrice"""
+    products, csrf_token = parse_search_html(fetch_search_page(keyword, page_num))
+    remember_csrf_token(csrf_token)
+    price_info = fetch_live_prices([product["sku"] for product in products], csrf_token)
+    return apply_live_prices(products, price_info)
+
+def standardize_page(products):
+    """Convierte los productos de una página al formato estándar"""
+    return [hlj_to_standard(item) for item in products]
+
+def get_parse_pool():
+    """
+    Retorna el pool de procesos compartido donde se parsea el HTML de HLJ
+    (None si config.hlj_parse_workers es 0 y se parsea en los hilos de descarga).
+    Los procesos se lanzan con "spawn" porque el proceso padre tiene hilos
+    de descarga y sesiones HTTP abiertas que no se deben heredar con fork.
+    """
+    global _parse_pool
+    if not config.hlj_parse_workers:
+        return None
+    with _parse_pool_lock:
+        if _parse_pool is None:
+            _parse_pool = ProcessPoolExecutor(
+                max_workers=config.hlj_parse_workers,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return _parse_pool
+
+@atexit.register
+def close_parse_pool(pool=None):
+    """
+    Cierra el pool de procesos de parseo (también al terminar el proceso).
+    Con pool, solo lo cierra si sigue siendo el compartido: otra búsqueda
+    puede haber creado ya uno nuevo tras detectar el mismo fallo.
+    """
+    global _parse_pool
+    with _parse_pool_lock:
+        if _parse_pool is None or (pool is not None and _parse_pool is not pool):
+            return
+        _parse_pool.shutdown(wait=False, cancel_futures=True)
+        _parse_pool = None
+
+def fetch_and_parse(keyword, page_num, parse_pool):
+    """
+    Descarga una página y la parsea: con pool retorna el futuro del parseo
+    en otro proceso, sin pool retorna directamente (productos, token CSRF)
+    """
+    html = fetch_search_page(keyword, page_num)
+    if parse_pool is None:
+        return parse_search_html(html)
+    return parse_pool.submit(parse_search_html, html, config.hlj_parser_backend)
+
+def iter_pages(keyword, pages=5, concurrency=config.hlj_page_workers,
+               batch_size=config.hlj_live_price_batch_size, standardize=False):
+    """
+    Genera los productos de cada página, en orden, a medida que se scrapean.
+    
+    Descarga hasta `concurrency` páginas a la vez (el ritmo global lo limita
+    config.host_rate_limits) y cada HTML descargado pasa al pool de procesos
+    de get_parse_pool, de modo que el parseo no compite por el GIL con las
+    descargas. Como mucho config.hlj_parse_queue_size páginas están en
+    descarga o en cola de parseo por delante de la actual.
+    
+    Los SKUs de páginas consecutivas que ya están parseadas se agrupan en
+    una sola petición livePrice de hasta batch_size SKUs, que se resuelve
+    mientras se descargan y parsean las páginas siguientes. Si la página
+    siguiente aún no está lista, el lote pendiente se envía sin esperar a
+    completarlo y sus páginas se emiten en cuanto llegan sus precios, para
+    que /search/stream no retenga la primera página hasta el final. Con standardize=True se emiten ya en
+    formato estándar, convertidas también en el pool de procesos. Se detiene
+    en la primera página vacía, descartando las páginas posteriores ya pedidas.
+    """
+    parse_pool = get_parse_pool()
+    fetch_executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="hlj")
+    # Hilo propio para que livePrice no espere detrás de las páginas en cola
+    price_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="hlj-price")
+    queue_size = max(concurrency, config.hlj_parse_queue_size)
+    page_futures = deque()
+    next_page = 1
+    
+    # Páginas parseadas que aún no tienen lote de livePrice, y lotes en curso
+    batch_pages = []
+    batch_skus = []
+    price_batches = deque()
+    
+    def fill_queue():
+        # Mantener la cola acotada de páginas por delante de la actual
+        nonlocal next_page
+        while next_page <= pages and len(page_futures) < queue_size:
+            page_futures.append(fetch_executor.submit(fetch_and_parse, keyword, next_page, parse_pool))
+            next_page += 1
+    
+    def next_page_ready():
+        # La página siguiente ya está descargada y parseada (o falló)
+        if not page_futures or not page_futures[0].done():
+            return False
+        if parse_pool is None or page_futures[0].exception() is not None:
+            return True
+        return page_futures[0].result().done()
+    
+    def submit_batch():
+        nonlocal batch_pages, batch_skus
+        price_batches.append((batch_pages, price_executor.submit(fetch_live_prices, batch_skus)))
+        batch_pages, batch_skus = [], []
+    
+    def emit_batch():
+        batch, price_future = price_batches.popleft()
+        price_info = price_future.result()
+        priced_pages = [apply_live_prices(page_products, price_info) for page_products in batch]
+        if not standardize:
+            yield from priced_pages
+        elif parse_pool is None:
+            yield from (standardize_page(page_products) for page_products in priced_pages)
+        else:
+            standard_futures = [parse_pool.submit(standardize_page, page_products)
+                                for page_products in priced_pages]
+            yield from (future.result() for future in standard_futures)
+    
+    try:
+        fill_queue()
+        for page_num in range(1, pages + 1):
+            print(f"Scraping página {page_num}…")
+            parsed = page_futures.popleft().result()
+            products, csrf_token = parsed.result() if parse_pool is not None else parsed
+            if not products:
+                break
+            remember_csrf_token(csrf_token)
+            
+            page_skus = [product["sku"] for product in products]
+            if batch_skus and len(batch_skus) + len(page_skus) > batch_size:
+                submit_batch()
+            batch_pages.append(products)
+            batch_skus.extend(page_skus)
+            fill_queue()
+            
+            if next_page_ready():
+                # Emitir los lotes anteriores; el último sigue resolviéndose
+                # mientras se procesa la página siguiente
+                while len(price_batches) > 1 or (price_batches and price_batches[0][1].done()):
+                    yield from emit_batch()
+                continue
+            
+            # No hay página lista con la que agrupar: pedir ya los precios y
+            # emitir mientras las descargas siguientes continúan
+            submit_batch()
+            while price_batches:
+                yield from emit_batch()
+        
+        if batch_pages:
+            submit_batch()
+        while price_batches:
+            yield from emit_batch()
+    except BrokenProcessPool:
+        # Un proceso de parseo murió: el pool ya no sirve, se crea otro en la próxima búsqueda
+        close_parse_pool(parse_pool)
+        raise
+    finally:
+        fetch_executor.shutdown(wait=False, cancel_futures=True)
+        price_executor.shutdown(wait=False, cancel_futures=True)
+
+def scrape_all(keyword, pages=5, concurrency=config.hlj_page_workers, standardize=False):
     all_products = []
-    for p in range(1, pages+1):
-        print(f"Scraping página {p}…")
-        prods = parse_page(keyword, p)
-        if not prods:
-            break
+    for prods in iter_pages(keyword, pages=pages, concurrency=concurrency, standardize=standardize):
         all_products.extend(prods)
-        time.sleep(delay)  # para no sobrecargar el servidor
     return all_products
 
+def refresh_tracked_prices(batch_size=config.hlj_live_price_batch_size,
+                           concurrency=config.hlj_page_workers):
+    """
+    Actualiza solo precio, disponibilidad y stock de los productos HLJ ya
+    guardados en neko_products, consultando livePrice en lotes sin descargar
+    ninguna página de búsqueda.
+    
+    Returns:
+        dict: SKUs consultados, SKUs sin respuesta y resultado del guardado
+    """
+    mongo = get_mongo_service()
+    skus = [doc["id"] for doc in mongo.iter_products_by_source("hlj", projection={"id": 1})]
+    print(f"🔄 Refrescando precios de {len(skus)} productos HLJ…")
+    
+    batches = [skus[start:start + batch_size] for start in range(0, len(skus), batch_size)]
+    products = []
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="hlj") as executor:
+        for price_info in executor.map(fetch_live_price_batch, batches):
+            for sku, item_data in price_info.items():
+                products.append(hlj_to_standard({"sku": sku, **item_data}))
+    
+    # Solo se escriben los campos de precio; título, URL e imagen se conservan
+    batch_result = mongo.upsert_products_batch(
+        products,
+        update_fields=PRICE_UPDATE_FIELDS,
+        record_changes=True
+    )
+    scraping_id = mongo.save_scraping_log(
+        source="hlj",
+        keyword="price-refresh",
+        total_products=len(products),
+        pages_processed=0,
+        summary={
+            field: batch_result[field]
+            for field in ("inserted_count", "updated_count", "unchanged_count", "change_event_count", "error_count")
+        }
+    )
+    
+    return {
+        "scraping_log_id": scraping_id,
+        "requested_skus": len(skus),
+        "missing_skus": len(skus) - len(products),
+        "products_result": batch_result
+    }
+
 def hlj_to_standard(item: dict) -> dict:
     """
     Convierte un producto en formato hlj al formato estándar.
@@ -161,9 +497,17 @@ def hlj_to_standard(item: dict) -> dict:
     }
 
 if __name__ == "__main__":
+    if "--prices" in sys.argv[1:]:
+        # Refresco de solo precios de los productos ya guardados: python hlj.py --prices
+        result = refresh_tracked_prices()
+        print(f"✅ Precios refrescados: {result['products_result']['updated_count']} actualizados, "
+              f"{result['products_result']['change_event_count']} eventos de cambio, "
+              f"{result['missing_skus']} SKUs sin respuesta")
+        sys.exit(0)
+    
     pages_to_scrape = 1
     keyword = "evangelion"
-    productos = scrape_all(keyword, pages=pages_to_scrape, delay=2)
+    productos = scrape_all(keyword, pages=pages_to_scrape)
     
     # Crear estructura con metadata para datos originales
     timestamp = datetime.now().isoformat()
@@ -199,13 +543,16 @@ if __name__ == "__main__":
             keyword=keyword,
             original_data=productos,
             standardized_products=productos_estandarizados,
-            pages_processed=pages_to_scrape
+            pages_processed=pages_to_scrape,
+            incremental=True
         )
         
         print(f"✅ Datos guardados en MongoDB:")
         print(f"   - Log de scraping ID: {mongo_result['scraping_log_id']}")
         print(f"   - Productos insertados: {mongo_result['products_result']['inserted_count']}")
         print(f"   - Productos actualizados: {mongo_result['products_result']['updated_count']}")
+        print(f"   - Productos sin cambios: {mongo_result['products_result']['unchanged_count']}")
+        print(f"   - Eventos de cambio: {mongo_result['products_result']['change_event_count']}")
         if mongo_result['products_result']['error_count'] > 0:
             print(f"   - Errores: {mongo_result['products_result']['error_count']}")
             
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Sesiones HTTP reutilizables para los scrapers
+Mantiene conexiones keep-alive por sitio para no pagar un handshake TCP+TLS
+(y, en curl_cffi, la configuración de impersonación) en cada petición
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+
+import requests
+from requests.adapters import HTTPAdapter
+from curl_cffi import requests as curl_requests
+
+import config
+
+_lock = threading.Lock()
+_hlj_session = None
+# Sesiones curl_cffi de AmiAmi libres; se reutilizan entre hilos y llamadas
+_amiami_sessions = []
+_rate_limiters = {}
+
+
+def get_hlj_session() -> requests.Session:
+    """
+    Retorna la sesión requests compartida para HLJ.
+    El pool de conexiones keep-alive tiene config.http_pool_size conexiones
+    por host, de modo que varios hilos pueden usarla a la vez.
+    """
+    global _hlj_session
+    if _hlj_session is None:
+        with _lock:
+            if _hlj_session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(
+                    pool_connections=config.http_pool_size,
+                    pool_maxsize=config.http_pool_size
+                )
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                _hlj_session = session
+    return _hlj_session
+
+
+@contextmanager
+def amiami_session():
+    """
+    Presta una sesión curl_cffi de AmiAmi del pool compartido.
+    
+    Las sesiones curl_cffi no son seguras entre hilos, así que cada hilo
+    usa una prestada en exclusiva y la devuelve al terminar la petición.
+    Como el pool no está ligado a los hilos, los ThreadPoolExecutor de
+    corta vida reutilizan las mismas conexiones (HTTP/2 vía ALPN con la
+    impersonación de Chrome) en lugar de abrir una por hilo nuevo. Se
+    conservan hasta config.http_pool_size sesiones libres; el resto se cierra.
+    
+    Uso:
+        with amiami_session() as session:
+            session.get(...)
+    """
+    with _lock:
+        session = _amiami_sessions.pop() if _amiami_sessions else None
+    if session is None:
+        # Handle curl propio de la sesión (no uno por hilo) para que sus
+        # conexiones sigan vivas aunque la use otro hilo la próxima vez
+        session = curl_requests.Session(
+            impersonate=config.amiami_impersonate,
+            use_thread_local_curl=False
+        )
+    
+    try:
+        yield session
+    finally:
+        with _lock:
+            if len(_amiami_sessions) < config.http_pool_size:
+                _amiami_sessions.append(session)
+                session = None
+        if session is not None:
+            session.close()
+
+
+class RateLimiter:
+    """Limita las peticiones a un ritmo máximo por segundo, compartido entre hilos"""
+
+    def __init__(self, rate_per_second: float):
+        self.interval = 1.0 / rate_per_second if rate_per_second else 0.0
+        self._lock = threading.Lock()
+        self._next_time = 0.0
+
+    def wait(self):
+        """Bloquea el hilo actual hasta que le toque su turno"""
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            scheduled = max(now, self._next_time)
+            self._next_time = scheduled + self.interval
+        if scheduled > now:
+            time.sleep(scheduled - now)
+
+
+def get_rate_limiter(host: str) -> RateLimiter:
+    """
+    Retorna el limitador compartido de un host, con el ritmo configurado en
+    config.host_rate_limits (sin límite si el host no aparece)
+    """
+    with _lock:
+        limiter = _rate_limiters.get(host)
+        if limiter is None:
+            limiter = RateLimiter(config.host_rate_limits.get(host, 0))
+            _rate_limiters[host] = limiter
+        return limiter
+
+
+def close_sessions():
+    """Cierra la sesión compartida de HLJ y las sesiones libres de AmiAmi"""
+    global _hlj_session
+    with _lock:
+        if _hlj_session is not None:
+            _hlj_session.close()
+            _hlj_session = None
+        
+        while _amiami_sessions:
+            _amiami_sessions.pop().close()
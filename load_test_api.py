@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Prueba de carga simple para la API Product Scraper.
+
+Lanza búsquedas concurrentes contra /search y, mientras tanto, mide la
+latencia de / para comprobar que el event loop sigue respondiendo.
+Ejecutar contra la versión anterior y la actual de la API para comparar
+requests/sec.
+
+Uso:
+    python load_test_api.py --keyword evangelion --site amiami --requests 20 --concurrency 10
+"""
+
+import argparse
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+API_BASE_URL = "http://127.0.0.1:8000"
+
+
+def timed_get(url, params=None, timeout=120):
+    """Hace una petición GET y retorna (status_code, segundos)"""
+    start = time.perf_counter()
+    try:
+        response = requests.get(url, params=params, timeout=timeout)
+        status = response.status_code
+    except requests.exceptions.RequestException:
+        status = None
+    return status, time.perf_counter() - start
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def probe_root(base_url, stop_event, latencies):
+    """Consulta / continuamente mientras dura la prueba de carga"""
+    while not stop_event.is_set():
+        status, elapsed = timed_get(f"{base_url}/", timeout=30)
+        if status == 200:
+            latencies.append(elapsed)
+        time.sleep(0.1)
+
+
+def run_load_test(base_url, keyword, site, limit, total_requests, concurrency):
+    params = {"keyword": keyword, "site": site, "limit": limit}
+
+    stop_event = threading.Event()
+    root_latencies = []
+    prober = threading.Thread(target=probe_root, args=(base_url, stop_event, root_latencies), daemon=True)
+    prober.start()
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(
+            lambda _: timed_get(f"{base_url}/search", params=params),
+            range(total_requests)
+        ))
+    wall_time = time.perf_counter() - start
+
+    stop_event.set()
+    prober.join()
+
+    ok_latencies = [elapsed for status, elapsed in results if status == 200]
+    errors = len(results) - len(ok_latencies)
+
+    print(f"📊 /search?keyword={keyword}&site={site}&limit={limit}")
+    print(f"   Peticiones: {total_requests} (concurrencia {concurrency})")
+    print(f"   Exitosas: {len(ok_latencies)} - Errores: {errors}")
+    print(f"   Tiempo total: {wall_time:.2f}s")
+    print(f"   Requests/sec: {len(ok_latencies) / wall_time:.2f}")
+    if ok_latencies:
+        print(f"   Latencia media: {statistics.mean(ok_latencies):.2f}s")
+        print(f"   Latencia p95: {percentile(ok_latencies, 95):.2f}s")
+
+    print(f"\n📊 Latencia de / durante la carga ({len(root_latencies)} muestras)")
+    if root_latencies:
+        print(f"   Media: {statistics.mean(root_latencies) * 1000:.1f}ms")
+        print(f"   p95: {percentile(root_latencies, 95) * 1000:.1f}ms")
+        print(f"   Máxima: {max(root_latencies) * 1000:.1f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prueba de carga para /search")
+    parser.add_argument("--base-url", default=API_BASE_URL)
+    parser.add_argument("--keyword", default="evangelion")
+    parser.add_argument("--site", default="amiami")
+    parser.add_argument("--limit", type=int, default=10)
+    parser.add_argument("--requests", type=int, default=20, dest="total_requests")
+    parser.add_argument("--concurrency", type=int, default=10)
+    args = parser.parse_args()
+
+    run_load_test(
+        args.base_url,
+        args.keyword,
+        args.site,
+        args.limit,
+        args.total_requests,
+        args.concurrency
+    )
+
+
+if __name__ == "__main__":
+    main()
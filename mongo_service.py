@@ -5,51 +5,413 @@ Servicio para interactuar con MongoDB
 Maneja el almacenamiento de datos de scraping y productos estandarizados
 """
 
-from pymongo import MongoClient
+from pymongo import MongoClient, UpdateOne
+from pymongo.errors import BulkWriteError
+from gridfs import GridFSBucket
+from bson import ObjectId
 from datetime import datetime
+import atexit
+import base64
 import config
+import gzip
+import hashlib
+import json
 import logging
-from typing import List, Dict, Any, Optional
+import re
+import threading
+from typing import List, Dict, Any, Optional, Iterator
 
 # Configurar logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Campos que se actualizan al refrescar un producto individual desde su página de detalle
+ITEM_UPDATE_FIELDS = ['title', 'price', 'availability', 'release_date', 'in_stock', 'is_preorder', 'review_images']
+
+# Campos del producto estandarizado que cuentan como cambio de precio, disponibilidad o stock
+CONTENT_HASH_FIELDS = ['price', 'currency', 'availability', 'in_stock', 'is_preorder', 'max_sale_qty']
+
+def product_content_hash(product: Dict[str, Any]) -> str:
+    """
+    Calcula el hash de contenido de un producto estandarizado a partir de
+    CONTENT_HASH_FIELDS (los campos ausentes cuentan como None)
+    """
+    content = {field: product.get(field) for field in CONTENT_HASH_FIELDS}
+    payload = json.dumps(content, sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+# Campos cuyo cambio genera un evento en la colección de eventos de precio
+CHANGE_EVENT_FIELDS = ['price', 'availability', 'in_stock']
+
+def build_change_event(product: Dict[str, Any],
+                       previous: Optional[Dict[str, Any]],
+                       timestamp: datetime) -> Optional[Dict[str, Any]]:
+    """
+    Construye el evento de cambio de un producto comparando sus campos
+    CHANGE_EVENT_FIELDS con los guardados (previous=None si es nuevo).
+    
+    Returns:
+        dict: Evento con solo los campos que cambiaron, o None si no hubo cambios
+    """
+    changes = {}
+    for field in CHANGE_EVENT_FIELDS:
+        if field not in product:
+            continue
+        old_value = previous.get(field) if previous else None
+        new_value = product.get(field)
+        if previous is None or old_value != new_value:
+            changes[field] = {"old": old_value, "new": new_value}
+    
+    if not changes:
+        return None
+    
+    return {
+        "product_id": product['id'],
+        "source": product.get('source'),
+        "timestamp": timestamp,
+        "changes": changes
+    }
+
+# Índices gestionados por colección (atributo de MongoService -> [(claves, opciones)])
+INDEX_PLAN = {
+    "products_collection": [
+        ([("id", 1)], {"unique": True}),
+        # get_products_by_source: filtro por source, paginación por (updated_at, _id)
+        ([("source", 1), ("updated_at", -1), ("_id", -1)], {}),
+        ([("jancode", 1)], {}),
+        ([("release_date", 1)], {}),
+        # find_products: listado sin fuente, filtro por stock y rango de precio
+        ([("updated_at", -1), ("_id", -1)], {}),
+        ([("in_stock", 1), ("updated_at", -1), ("_id", -1)], {}),
+        ([("price", 1)], {}),
+    ],
+    "scrapping_collection": [
+        # get_scraping_logs: filtro opcional por source, paginación por (timestamp, _id)
+        ([("source", 1), ("timestamp", -1), ("_id", -1)], {}),
+        ([("timestamp", -1), ("_id", -1)], {}),
+        # get_last_scrape: último scrape de una fuente y keyword
+        ([("source", 1), ("search_keyword", 1), ("timestamp", -1), ("_id", -1)], {}),
+    ],
+    "price_events_collection": [
+        # Historial de cambios de un producto ordenado por fecha
+        ([("product_id", 1), ("timestamp", -1)], {}),
+    ],
+}
+
+# Los listados de logs no traen los productos embebidos (formato legacy)
+SCRAPING_LOG_SUMMARY_PROJECTION = {"products_data": 0}
+
+# Campos internos que no se exponen en las lecturas del catálogo
+PRODUCT_PUBLIC_PROJECTION = {"content_hash": 0}
+
+def encode_cursor(doc: Dict[str, Any], sort_field: str) -> str:
+    """Codifica la posición (sort_field, _id) de un documento como cursor opaco"""
+    value = doc[sort_field]
+    payload = {
+        "v": value.isoformat() if isinstance(value, datetime) else value,
+        "d": isinstance(value, datetime),
+        "id": str(doc["_id"])
+    }
+    return base64.urlsafe_b64encode(json.dumps(payload).encode("utf-8")).decode("ascii")
+
+def decode_cursor(cursor: str) -> tuple:
+    """
+    Decodifica un cursor de encode_cursor.
+    
+    Returns:
+        tuple: (valor del campo de orden, ObjectId)
+    
+    Raises:
+        ValueError: Si el cursor no es válido
+    """
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        value = datetime.fromisoformat(payload["v"]) if payload["d"] else payload["v"]
+        return value, ObjectId(payload["id"])
+    except Exception as e:
+        raise ValueError(f"Cursor inválido: {cursor}") from e
+
+def _keyset_projection(projection: Optional[Dict[str, Any]], sort_field: str) -> Optional[Dict[str, Any]]:
+    """Ajusta una proyección para que siempre incluya los campos del cursor"""
+    if projection is None:
+        return None
+    projection = dict(projection)
+    projection.pop("_id", None)
+    if any(projection.values()):
+        projection[sort_field] = 1
+    else:
+        projection.pop(sort_field, None)
+    return projection
+
+# Constructores de las consultas de los helpers de lectura; check_query_plans
+# usa los mismos para que el explain refleje lo que se ejecuta de verdad
+
+def _keyset_sort(sort_field: str) -> List[tuple]:
+    """Orden de más reciente a más antiguo por (sort_field, _id)"""
+    return [(sort_field, -1), ("_id", -1)]
+
+def _source_query(source: Optional[str]) -> Dict[str, Any]:
+    """Filtro por fuente; sin fuente, todos los documentos"""
+    return {"source": source} if source else {}
+
+def _product_filter_query(source: Optional[str] = None,
+                          availability: Optional[str] = None,
+                          in_stock: Optional[bool] = None,
+                          release_from: Optional[str] = None,
+                          release_to: Optional[str] = None,
+                          price_min: Optional[int] = None,
+                          price_max: Optional[int] = None) -> Dict[str, Any]:
+    """Filtro de find_products"""
+    query = _source_query(source)
+    if availability:
+        query["availability"] = availability
+    if in_stock is not None:
+        query["in_stock"] = in_stock
+    
+    # release_date es ISO 8601 con o sin hora según la fuente, así que
+    # el límite superior es exclusivo para no perder el último día
+    release_range = {}
+    if release_from:
+        release_range["$gte"] = release_from
+    if release_to:
+        release_range["$lt"] = release_to
+    if release_range:
+        query["release_date"] = release_range
+    
+    price_range = {}
+    if price_min is not None:
+        price_range["$gte"] = price_min
+    if price_max is not None:
+        price_range["$lte"] = price_max
+    if price_range:
+        query["price"] = price_range
+    
+    return query
+
+def _stored_search_query(source: str, keyword: str) -> Dict[str, Any]:
+    """Filtro de search_stored_products: todas las palabras de la keyword en el título"""
+    query = {"source": source}
+    words = keyword.split()
+    if words:
+        query["$and"] = [
+            {"title": {"$regex": re.escape(word), "$options": "i"}}
+            for word in words
+        ]
+    return query
+
+def _product_ids_query(product_ids: List[str]) -> Dict[str, Any]:
+    """Filtro de get_products_by_ids"""
+    return {"id": {"$in": product_ids}}
+
+def _last_scrape_query(source: str, keyword: str, min_pages: int = 1) -> Dict[str, Any]:
+    """Filtro de get_last_scrape"""
+    return {"source": source, "search_keyword": keyword, "pages_processed": {"$gte": min_pages}}
+
+def _product_changes_query(product_id: str,
+                           field: Optional[str] = None,
+                           since: Optional[datetime] = None) -> Dict[str, Any]:
+    """Filtro de get_product_changes"""
+    query = {"product_id": product_id}
+    if field:
+        query[f"changes.{field}"] = {"$exists": True}
+    if since:
+        query["timestamp"] = {"$gte": since}
+    return query
+
+# Conteo por fuente; el $sort previo permite resolverlo recorriendo el índice de source
+SOURCE_COUNT_PIPELINE = [
+    {"$sort": {"source": 1}},
+    {"$group": {"_id": "$source", "count": {"$sum": 1}}}
+]
+
+def _winning_plan_stages(explain: Any) -> List[str]:
+    """Recorre la salida de explain y retorna las etapas de los planes ganadores"""
+    stages = []
+    
+    def collect_stages(plan):
+        if isinstance(plan, dict):
+            if "stage" in plan:
+                stages.append(plan["stage"])
+            for value in plan.values():
+                collect_stages(value)
+        elif isinstance(plan, list):
+            for value in plan:
+                collect_stages(value)
+    
+    def find_plans(node):
+        if isinstance(node, dict):
+            for key, value in node.items():
+                if key == "winningPlan":
+                    collect_stages(value)
+                else:
+                    find_plans(value)
+        elif isinstance(node, list):
+            for value in node:
+                find_plans(value)
+    
+    find_plans(explain)
+    return stages
+
+class QueryPlanError(Exception):
+    """Una consulta de los helpers de MongoService no usa ningún índice"""
+
+# Cliente y servicio compartidos por todo el proceso (ver get_mongo_service)
+_shared_lock = threading.Lock()
+_shared_client = None
+_shared_service = None
+
 class MongoService:
     """Servicio para manejar operaciones con MongoDB"""
     
-    def __init__(self):
-        """Inicializar conexión a MongoDB"""
+    # Los índices se crean una sola vez por proceso
+    _indexes_lock = threading.Lock()
+    _indexes_ready = False
+    
+    def __init__(self, client: Optional[MongoClient] = None):
+        """
+        Inicializar conexión a MongoDB
+        
+        Args:
+            client: Cliente existente a reutilizar (opcional). Si no se pasa,
+                    se crea uno propio que se cierra con close_connection
+        """
         try:
-            self.client = MongoClient(config.mongodburl)
+            self._owns_client = client is None
+            self.client = client if client is not None else MongoClient(config.mongodburl)
             self.db = self.client[config.database]
             self.products_collection = self.db[config.products_collection]
             self.scrapping_collection = self.db[config.scrapping_collection]
             self.scrapping_item_collection = self.db[config.scrapping_item_collection]
+            self.search_cache_collection = self.db[config.search_cache_collection]
+            self.price_events_collection = self.db[config.price_events_collection]
+            self.raw_data_bucket = GridFSBucket(self.db, bucket_name=config.scrapping_raw_bucket)
             
-            # Crear índice único en la colección de productos por el campo 'id'
-            self.products_collection.create_index("id", unique=True)
+            self._bootstrap_indexes()
             
             logger.info("Conexión a MongoDB establecida correctamente")
         except Exception as e:
             logger.error(f"Error conectando a MongoDB: {e}")
             raise
 
+    def _bootstrap_indexes(self):
+        """Crea los índices la primera vez que se instancia el servicio en el proceso"""
+        if MongoService._indexes_ready:
+            return
+        with MongoService._indexes_lock:
+            if MongoService._indexes_ready:
+                return
+            self.ensure_indexes()
+            MongoService._indexes_ready = True
+
+    def ensure_indexes(self) -> Dict[str, List[str]]:
+        """
+        Crea (si no existen) todos los índices de INDEX_PLAN.
+        
+        Returns:
+            dict: Nombres de los índices por colección
+        """
+        created = {}
+        for collection_attr, indexes in INDEX_PLAN.items():
+            collection = getattr(self, collection_attr)
+            created[collection.name] = [
+                collection.create_index(keys, **options)
+                for keys, options in indexes
+            ]
+        logger.info(f"Índices verificados: {created}")
+        return created
+
+    def check_query_plans(self, raise_on_collscan: bool = True) -> Dict[str, List[str]]:
+        """
+        Ejecuta explain sobre las consultas de los helpers de lectura y
+        comprueba que ninguna recurra a COLLSCAN.
+        
+        Args:
+            raise_on_collscan: Lanzar QueryPlanError si alguna consulta hace COLLSCAN
+        
+        Returns:
+            dict: Etapas del plan ganador de cada consulta
+        """
+        sample_date = datetime.now().date().isoformat()
+        find_checks = {
+            "get_products_by_source": (
+                self.products_collection, _source_query("amiami"), "updated_at"),
+            "get_scraping_logs(source)": (
+                self.scrapping_collection, _source_query("amiami"), "timestamp"),
+            "get_scraping_logs": (
+                self.scrapping_collection, _source_query(None), "timestamp"),
+            "find_products": (
+                self.products_collection, _product_filter_query(), "updated_at"),
+            "find_products(source)": (
+                self.products_collection, _product_filter_query(source="amiami"), "updated_at"),
+            "find_products(in_stock)": (
+                self.products_collection, _product_filter_query(in_stock=True), "updated_at"),
+            "find_products(release_date)": (
+                self.products_collection, _product_filter_query(release_from=sample_date), "updated_at"),
+            "find_products(price)": (
+                self.products_collection, _product_filter_query(price_min=1000, price_max=5000), "updated_at"),
+            "search_stored_products": (
+                self.products_collection, _stored_search_query("amiami", "figure"), "updated_at"),
+            "get_products_by_ids": (
+                self.products_collection, _product_ids_query(["FIGURE-000000", "FIGURE-000001"]), None),
+            "get_last_scrape": (
+                self.scrapping_collection, _last_scrape_query("amiami", "figure"), "timestamp"),
+            "get_product_changes": (
+                self.price_events_collection, _product_changes_query("FIGURE-000000"), "timestamp"),
+            "get_price_history": (
+                self.price_events_collection, _product_changes_query("FIGURE-000000", field="price"), "timestamp"),
+        }
+        
+        plans = {}
+        for name, (collection, query, sort_field) in find_checks.items():
+            cursor = collection.find(query)
+            if sort_field:
+                cursor = cursor.sort(_keyset_sort(sort_field))
+            plans[name] = _winning_plan_stages(cursor.explain())
+        
+        for name, collection in (("get_collection_stats(products)", self.products_collection),
+                                 ("get_collection_stats(scraping)", self.scrapping_collection)):
+            explain = self.db.command(
+                "aggregate", collection.name,
+                pipeline=SOURCE_COUNT_PIPELINE,
+                explain=True
+            )
+            plans[name] = _winning_plan_stages(explain)
+        
+        collscans = [name for name, stages in plans.items() if "COLLSCAN" in stages]
+        if collscans:
+            logger.error(f"Consultas sin índice (COLLSCAN): {collscans}")
+            if raise_on_collscan:
+                raise QueryPlanError(f"Consultas sin índice (COLLSCAN): {', '.join(collscans)}")
+        
+        return plans
+
     def save_scraping_log(self, 
                          source: str, 
                          keyword: str, 
                          total_products: int, 
                          pages_processed: int, 
-                         products_data: List[Dict[str, Any]]) -> str:
+                         products_data: Optional[List[Dict[str, Any]]] = None,
+                         summary: Optional[Dict[str, Any]] = None,
+                         raw_data: Optional[Dict[str, Any]] = None,
+                         product_ids: Optional[List[str]] = None) -> str:
         """
-        Guarda un log completo del scraping en la colección de scrapping.
+        Guarda un log del scraping en la colección de scrapping.
+        
+        Por defecto el log es compacto (contadores y resumen). Los datos
+        originales se guardan aparte con save_raw_payload y el log solo
+        incluye su manifiesto (raw_data); products_data se sigue aceptando
+        para incrustarlos directamente en crawls pequeños. Los cambios de
+        cada producto quedan en la colección de eventos de precio.
         
         Args:
             source: Fuente del scraping ('amiami', 'hlj', etc.)
             keyword: Palabra clave utilizada en la búsqueda
             total_products: Total de productos encontrados
             pages_processed: Número de páginas procesadas
-            products_data: Lista completa de productos scraped (formato original)
+            products_data: Lista completa de productos scraped (formato original, opcional)
+            summary: Resumen del guardado de productos (insertados, cambios, etc.)
+            raw_data: Manifiesto de los datos originales guardados en GridFS (opcional)
+            product_ids: IDs de los productos devueltos, en orden (opcional)
         
         Returns:
             str: ID del documento insertado
@@ -60,9 +422,16 @@ class MongoService:
                 "search_keyword": keyword,
                 "total_products": total_products,
                 "pages_processed": pages_processed,
-                "timestamp": datetime.now(),
-                "products_data": products_data
+                "timestamp": datetime.now()
             }
+            if summary is not None:
+                scraping_log["summary"] = summary
+            if raw_data is not None:
+                scraping_log["raw_data"] = raw_data
+            if products_data is not None:
+                scraping_log["products_data"] = products_data
+            if product_ids is not None:
+                scraping_log["product_ids"] = product_ids
             
             result = self.scrapping_collection.insert_one(scraping_log)
             logger.info(f"Log de scraping guardado para {source} - {keyword}: {result.inserted_id}")
@@ -72,6 +441,93 @@ class MongoService:
             logger.error(f"Error guardando log de scraping: {e}")
             raise
 
+    def save_raw_payload(self, 
+                         source: str, 
+                         keyword: str, 
+                         products_data: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Guarda los datos originales de un scraping en GridFS como NDJSON
+        comprimido con gzip. Se escribe en streaming (un producto por línea),
+        así que el tamaño no está limitado por los 16 MB de un documento.
+        
+        Args:
+            source: Fuente del scraping ('amiami', 'hlj', etc.)
+            keyword: Palabra clave utilizada en la búsqueda
+            products_data: Lista completa de productos scraped (formato original)
+        
+        Returns:
+            dict: Manifiesto para guardar en el log de scraping
+        """
+        try:
+            timestamp = datetime.now()
+            filename = f"{source}-{keyword}-{timestamp:%Y%m%d%H%M%S}.ndjson.gz"
+            raw_bytes = 0
+            
+            grid_in = self.raw_data_bucket.open_upload_stream(
+                filename,
+                metadata={"source": source, "search_keyword": keyword, "content_type": "application/x-ndjson", "compression": "gzip"}
+            )
+            try:
+                with gzip.GzipFile(fileobj=grid_in, mode="wb") as gz:
+                    for product in products_data:
+                        line = json.dumps(product, ensure_ascii=False, default=str).encode("utf-8") + b"\n"
+                        gz.write(line)
+                        raw_bytes += len(line)
+            except Exception:
+                grid_in.abort()
+                raise
+            grid_in.close()
+            
+            logger.info(f"Datos originales guardados en GridFS para {source} - {keyword}: {grid_in._id} "
+                        f"({raw_bytes} bytes -> {grid_in.length} bytes)")
+            
+            return {
+                "storage": "gridfs",
+                "bucket": config.scrapping_raw_bucket,
+                "file_id": grid_in._id,
+                "format": "ndjson",
+                "compression": "gzip",
+                "records": len(products_data),
+                "raw_bytes": raw_bytes,
+                "stored_bytes": grid_in.length
+            }
+            
+        except Exception as e:
+            logger.error(f"Error guardando datos originales en GridFS: {e}")
+            raise
+
+    def iter_scraping_raw_data(self, scraping_log_id: str) -> Iterator[Dict[str, Any]]:
+        """
+        Lee en streaming los datos originales de un log de scraping, tanto
+        si están en GridFS como si están incrustados (logs antiguos).
+        
+        Args:
+            scraping_log_id: ID del log de scraping
+        
+        Yields:
+            dict: Cada producto en formato original
+        """
+        scraping_log = self.scrapping_collection.find_one(
+            {"_id": ObjectId(scraping_log_id)},
+            {"raw_data": 1, "products_data": 1}
+        )
+        if not scraping_log:
+            return
+        
+        if "products_data" in scraping_log:
+            yield from scraping_log["products_data"]
+            return
+        
+        raw_data = scraping_log.get("raw_data")
+        if not raw_data:
+            return
+        
+        grid_out = self.raw_data_bucket.open_download_stream(raw_data["file_id"])
+        with gzip.GzipFile(fileobj=grid_out, mode="rb") as gz:
+            for line in gz:
+                if line.strip():
+                    yield json.loads(line)
+
     def save_item_scraping_log(self, 
                               source: str, 
                               product_id: str, 
@@ -103,6 +559,39 @@ class MongoService:
             logger.error(f"Error guardando log de scraping individual: {e}")
             raise
 
+    def save_item_scraping_logs_batch(self, 
+                                     source: str, 
+                                     items: List[Dict[str, Any]]) -> List[str]:
+        """
+        Guarda varios logs de scraping individual con un solo insert_many.
+        
+        Args:
+            source: Fuente del scraping ('amiami', 'hlj', etc.)
+            items: Lista de dicts con 'product_id' y 'original_data'
+        
+        Returns:
+            list: IDs de los documentos insertados
+        """
+        if not items:
+            return []
+        
+        try:
+            now = datetime.now()
+            item_logs = [{
+                "source": source,
+                "product_id": item["product_id"],
+                "timestamp": now,
+                "original_data": item["original_data"]
+            } for item in items]
+            
+            result = self.scrapping_item_collection.insert_many(item_logs, ordered=False)
+            logger.info(f"{len(result.inserted_ids)} logs de scraping individual guardados para {source}")
+            return [str(inserted_id) for inserted_id in result.inserted_ids]
+            
+        except Exception as e:
+            logger.error(f"Error guardando logs de scraping individual: {e}")
+            raise
+
     def upsert_product(self, product: Dict[str, Any], partial_update: bool = False, 
                       update_fields: Optional[List[str]] = None) -> Dict[str, Any]:
         """
@@ -119,11 +608,17 @@ class MongoService:
             if not product.get('id'):
                 raise ValueError("El producto debe tener un campo 'id'")
             
-            # Añadir timestamp de actualización
+            # Trabajar sobre una copia para no modificar el dict del llamador
+            product = dict(product)
+            
+            # Añadir timestamps de actualización y verificación y hash de contenido
             product['updated_at'] = datetime.now()
+            product['last_seen_at'] = product['updated_at']
+            product['content_hash'] = product_content_hash(product)
             
             # Si es la primera vez que se inserta, añadir created_at
             existing_product = self.products_collection.find_one({"id": product['id']})
+            change_event = build_change_event(product, existing_product, product['updated_at'])
             
             if not existing_product:
                 product['created_at'] = datetime.now()
@@ -143,6 +638,8 @@ class MongoService:
                     # Actualización parcial: solo campos especificados
                     update_data = {field: product[field] for field in update_fields if field in product}
                     update_data['updated_at'] = product['updated_at']
+                    update_data['last_seen_at'] = product['last_seen_at']
+                    update_data['content_hash'] = product['content_hash']
                     update_data['created_at'] = product['created_at']
                     
                     result = self.products_collection.update_one(
@@ -157,6 +654,9 @@ class MongoService:
                         upsert=True
                     )
             
+            if change_event:
+                self.price_events_collection.insert_one(change_event)
+            
             logger.info(f"Producto {operation_type}: {product['id']} - {product.get('title', 'Sin título')}")
             
             return {
@@ -164,19 +664,50 @@ class MongoService:
                 "operation": operation_type,
                 "matched_count": result.matched_count,
                 "modified_count": result.modified_count,
-                "upserted_id": result.upserted_id
+                "upserted_id": result.upserted_id,
+                "change_event": change_event is not None
             }
             
         except Exception as e:
             logger.error(f"Error en upsert de producto {product.get('id', 'ID desconocido')}: {e}")
             raise
 
-    def upsert_products_batch(self, products: List[Dict[str, Any]]) -> Dict[str, Any]:
+    def upsert_products_batch(self, products: List[Dict[str, Any]],
+                              ordered: bool = False,
+                              batch_size: int = 1000,
+                              update_fields: Optional[List[str]] = None,
+                              incremental: bool = False,
+                              record_changes: bool = False) -> Dict[str, Any]:
         """
-        Inserta o actualiza múltiples productos de manera eficiente.
+        Inserta o actualiza múltiples productos usando bulk_write.
+        
+        Cada producto se convierte en un UpdateOne con upsert: los campos se
+        escriben con $set (incluido updated_at) y created_at solo se fija con
+        $setOnInsert, de modo que un lote completo se persiste en una o pocas
+        peticiones a MongoDB en lugar de dos por producto.
+        
+        Con update_fields, los productos existentes solo actualizan esos
+        campos; el resto se escribe únicamente al insertar (como
+        upsert_product con partial_update).
+        
+        Cada producto guarda un content_hash (ver product_content_hash). En
+        modo incremental, los productos cuyo hash coincide con el guardado
+        no se escriben y se cuentan como unchanged; de ellos solo se marca
+        last_seen_at con un update_many por lote. Todos los productos del
+        lote quedan con last_seen_at, que indica cuándo se verificaron por
+        última vez aunque updated_at no cambie.
+        
+        Con record_changes, cada producto nuevo o con cambios de precio,
+        disponibilidad o stock (CHANGE_EVENT_FIELDS) genera un evento
+        compacto en la colección de eventos, escritos con un insert_many por lote.
         
         Args:
             products: Lista de productos en formato estandarizado
+            ordered: Si es True, la escritura se detiene en el primer error
+            batch_size: Número máximo de operaciones por llamada a bulk_write
+            update_fields: Campos a actualizar en productos existentes (opcional)
+            incremental: Omitir productos sin cambios de precio, disponibilidad o stock
+            record_changes: Registrar eventos de cambio de precio/stock/disponibilidad
         
         Returns:
             dict: Estadísticas de la operación
@@ -184,27 +715,128 @@ class MongoService:
         try:
             inserted_count = 0
             updated_count = 0
+            unchanged_count = 0
+            change_event_count = 0
+            inserted_ids = []
             errors = []
+            valid_products = []
+            now = datetime.now()
             
             for product in products:
-                try:
-                    result = self.upsert_product(product)
-                    if result['operation'] == 'inserted':
-                        inserted_count += 1
-                    else:
-                        updated_count += 1
-                except Exception as e:
+                if not product.get('id'):
                     errors.append({
-                        "product_id": product.get('id', 'Desconocido'),
-                        "error": str(e)
+                        "product_id": 'Desconocido',
+                        "error": "El producto debe tener un campo 'id'"
                     })
+                    continue
+                valid_products.append(product)
+            
+            for start in range(0, len(valid_products), batch_size):
+                chunk_products = valid_products[start:start + batch_size]
+                hashes = [product_content_hash(product) for product in chunk_products]
+                
+                stored = {}
+                if incremental or record_changes:
+                    # Una sola consulta por lote para conocer el hash y los valores guardados
+                    projection = {field: 1 for field in CHANGE_EVENT_FIELDS}
+                    projection.update({"id": 1, "content_hash": 1, "_id": 0})
+                    stored = {
+                        doc['id']: doc
+                        for doc in self.products_collection.find(
+                            {"id": {"$in": [product['id'] for product in chunk_products]}},
+                            projection
+                        )
+                    }
+                
+                operations = []
+                operation_ids = []
+                unchanged_ids = []
+                change_events = {}
+                for product, content_hash in zip(chunk_products, hashes):
+                    previous = stored.get(product['id'])
+                    if incremental and previous and previous.get('content_hash') == content_hash:
+                        unchanged_ids.append(product['id'])
+                        continue
+                    
+                    if record_changes:
+                        change_event = build_change_event(product, previous, now)
+                        if change_event:
+                            change_events[product['id']] = change_event
+                    
+                    # Los dicts del llamador no se modifican (pueden venir de la caché de búsquedas)
+                    update_data = {k: v for k, v in product.items() if k not in ('_id', 'created_at')}
+                    update_data['updated_at'] = now
+                    update_data['last_seen_at'] = now
+                    update_data['content_hash'] = content_hash
+                    insert_data = {"created_at": now}
+                    if update_fields:
+                        # Solo las fechas, content_hash y los campos indicados se pisan en productos existentes
+                        for field in list(update_data):
+                            if field not in update_fields and field not in ('id', 'updated_at', 'last_seen_at', 'content_hash'):
+                                insert_data[field] = update_data.pop(field)
+                    operations.append(UpdateOne(
+                        {"id": product['id']},
+                        {"$set": update_data, "$setOnInsert": insert_data},
+                        upsert=True
+                    ))
+                    operation_ids.append(product['id'])
+                
+                if unchanged_ids:
+                    # Sin cambios: updated_at se conserva, pero el producto se acaba de verificar
+                    self.products_collection.update_many(
+                        {"id": {"$in": unchanged_ids}},
+                        {"$set": {"last_seen_at": now}}
+                    )
+                    unchanged_count += len(unchanged_ids)
+                
+                if not operations:
+                    continue
+                
+                failed_indexes = set()
+                try:
+                    result = self.products_collection.bulk_write(operations, ordered=ordered)
+                    inserted_count += result.upserted_count
+                    updated_count += result.matched_count
+                    inserted_ids.extend(operation_ids[index] for index in result.upserted_ids)
+                except BulkWriteError as bwe:
+                    details = bwe.details
+                    inserted_count += details.get('nUpserted', 0)
+                    updated_count += details.get('nMatched', 0)
+                    inserted_ids.extend(operation_ids[upsert['index']] for upsert in details.get('upserted', []))
+                    for write_error in details.get('writeErrors', []):
+                        failed_indexes.add(write_error['index'])
+                        errors.append({
+                            "product_id": operation_ids[write_error['index']],
+                            "error": write_error.get('errmsg', 'Error desconocido')
+                        })
+                    if ordered and failed_indexes:
+                        # En modo ordenado las operaciones restantes no se ejecutan
+                        failed_indexes.update(range(min(failed_indexes), len(operations)))
+                
+                if change_events:
+                    # Solo se registran eventos de productos que se escribieron
+                    written_events = [
+                        change_events[product_id]
+                        for index, product_id in enumerate(operation_ids)
+                        if index not in failed_indexes and product_id in change_events
+                    ]
+                    if written_events:
+                        self.price_events_collection.insert_many(written_events, ordered=False)
+                        change_event_count += len(written_events)
+                
+                if ordered and failed_indexes:
+                    break
             
-            logger.info(f"Batch upsert completado: {inserted_count} insertados, {updated_count} actualizados, {len(errors)} errores")
+            logger.info(f"Batch upsert completado: {inserted_count} insertados, {updated_count} actualizados, "
+                        f"{unchanged_count} sin cambios, {change_event_count} eventos, {len(errors)} errores")
             
             return {
                 "total_processed": len(products),
                 "inserted_count": inserted_count,
                 "updated_count": updated_count,
+                "unchanged_count": unchanged_count,
+                "change_event_count": change_event_count,
+                "inserted_ids": inserted_ids,
                 "error_count": len(errors),
                 "errors": errors
             }
@@ -213,68 +845,397 @@ class MongoService:
             logger.error(f"Error en batch upsert: {e}")
             raise
 
-    def get_product_by_id(self, product_id: str) -> Optional[Dict[str, Any]]:
+    def ensure_search_cache_index(self, ttl_seconds: int):
+        """
+        Crea el índice TTL de la caché de búsquedas para que MongoDB
+        elimine las entradas expiradas.
+        
+        Args:
+            ttl_seconds: Segundos de vida de cada entrada
+        """
+        self.search_cache_collection.create_index("created_at", expireAfterSeconds=ttl_seconds)
+
+    def get_cached_search(self, cache_key: str) -> Optional[Dict[str, Any]]:
+        """
+        Obtiene una búsqueda cacheada por su clave.
+        
+        Args:
+            cache_key: Clave de la búsqueda
+        
+        Returns:
+            dict: Documento con 'products' y 'created_at', o None
+        """
+        try:
+            return self.search_cache_collection.find_one({"_id": cache_key})
+        except Exception as e:
+            logger.error(f"Error obteniendo búsqueda cacheada {cache_key}: {e}")
+            return None
+
+    def save_cached_search(self, cache_key: str, products: List[Dict[str, Any]],
+                           created_at: Optional[datetime] = None):
+        """
+        Guarda (o reemplaza) una búsqueda cacheada.
+        
+        Args:
+            cache_key: Clave de la búsqueda
+            products: Productos en formato estandarizado
+            created_at: Momento en que se obtuvieron los productos
+        """
+        try:
+            self.search_cache_collection.replace_one(
+                {"_id": cache_key},
+                {"products": products, "created_at": created_at or datetime.now()},
+                upsert=True
+            )
+        except Exception as e:
+            logger.error(f"Error guardando búsqueda cacheada {cache_key}: {e}")
+
+    def get_product_by_id(self, 
+                          product_id: str,
+                          projection: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
         """
         Obtiene un producto por su ID.
         
         Args:
             product_id: ID del producto
+            projection: Campos a incluir/excluir (opcional)
         
         Returns:
             dict: Producto encontrado o None
         """
         try:
-            return self.products_collection.find_one({"id": product_id})
+            return self.products_collection.find_one({"id": product_id}, projection)
         except Exception as e:
             logger.error(f"Error obteniendo producto {product_id}: {e}")
             return None
 
+    def get_products_by_ids(self,
+                            product_ids: List[str],
+                            projection: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """
+        Obtiene varios productos por su ID en una sola consulta.
+        
+        Args:
+            product_ids: IDs de los productos
+            projection: Campos a incluir/excluir (opcional)
+        
+        Returns:
+            list: Productos encontrados, en el orden de product_ids
+        """
+        found = {
+            product['id']: product
+            for product in self.products_collection.find(_product_ids_query(product_ids),
+                                                         _keyset_projection(projection, "id"))
+        }
+        return [found[product_id] for product_id in product_ids if product_id in found]
+
+    def get_product_changes(self, 
+                            product_id: str, 
+                            field: Optional[str] = None, 
+                            since: Optional[datetime] = None, 
+                            limit: int = 100) -> List[Dict[str, Any]]:
+        """
+        Obtiene los eventos de cambio de un producto, del más reciente al más antiguo.
+        
+        Args:
+            product_id: ID del producto
+            field: Solo eventos que cambiaron este campo (opcional)
+            since: Solo eventos posteriores a esta fecha (opcional)
+            limit: Número máximo de eventos a retornar
+        
+        Returns:
+            list: Lista de eventos de cambio
+        """
+        try:
+            query = _product_changes_query(product_id, field, since)
+            
+            # _id desempata eventos registrados en el mismo milisegundo
+            return list(self.price_events_collection.find(query, {"_id": 0})
+                       .sort(_keyset_sort("timestamp"))
+                       .limit(limit))
+        except Exception as e:
+            logger.error(f"Error obteniendo cambios del producto {product_id}: {e}")
+            return []
+
+    def get_price_history(self, 
+                          product_id: str, 
+                          since: Optional[datetime] = None, 
+                          limit: int = 100) -> List[Dict[str, Any]]:
+        """
+        Obtiene el historial de precios de un producto en orden cronológico.
+        
+        Args:
+            product_id: ID del producto
+            since: Solo cambios posteriores a esta fecha (opcional)
+            limit: Número máximo de cambios a retornar (los más recientes)
+        
+        Returns:
+            list: Lista de dicts con 'timestamp', 'old_price' y 'price'
+        """
+        events = self.get_product_changes(product_id, field="price", since=since, limit=limit)
+        return [{
+            "timestamp": event["timestamp"],
+            "old_price": event["changes"]["price"]["old"],
+            "price": event["changes"]["price"]["new"]
+        } for event in reversed(events)]
+
+    def _find_page(self,
+                   collection,
+                   query: Dict[str, Any],
+                   sort_field: str,
+                   limit: int,
+                   cursor: Optional[str] = None,
+                   projection: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        Página de resultados ordenados de más reciente a más antiguo por
+        (sort_field, _id), continuando después de la posición del cursor.
+        
+        Returns:
+            dict: items y next_cursor (None si no hay más resultados)
+        """
+        if cursor:
+            value, last_id = decode_cursor(cursor)
+            query = {"$and": [query, {"$or": [
+                {sort_field: {"$lt": value}},
+                {sort_field: value, "_id": {"$lt": last_id}}
+            ]}]}
+        
+        # Pedir un documento extra para saber si hay página siguiente
+        items = list(collection.find(query, _keyset_projection(projection, sort_field))
+                     .sort(_keyset_sort(sort_field))
+                     .limit(limit + 1))
+        
+        next_cursor = None
+        if len(items) > limit:
+            items = items[:limit]
+            next_cursor = encode_cursor(items[-1], sort_field)
+        
+        return {"items": items, "next_cursor": next_cursor}
+
+    def _iter_sorted(self,
+                     collection,
+                     query: Dict[str, Any],
+                     sort_field: str,
+                     projection: Optional[Dict[str, Any]] = None,
+                     batch_size: int = 500) -> Iterator[Dict[str, Any]]:
+        """Recorre todos los resultados por (sort_field, _id) trayendo lotes de batch_size"""
+        yield from (collection.find(query, projection)
+                    .sort(_keyset_sort(sort_field))
+                    .batch_size(batch_size))
+
+    def get_scraping_logs_page(self,
+                               source: Optional[str] = None,
+                               limit: int = 10,
+                               cursor: Optional[str] = None,
+                               projection: Optional[Dict[str, Any]] = SCRAPING_LOG_SUMMARY_PROJECTION) -> Dict[str, Any]:
+        """
+        Obtiene una página de logs de scraping, del más reciente al más antiguo.
+        
+        Args:
+            source: Fuente a filtrar (opcional)
+            limit: Número máximo de logs de la página
+            cursor: next_cursor de la página anterior (opcional)
+            projection: Campos a incluir/excluir (por defecto sin products_data)
+        
+        Returns:
+            dict: items y next_cursor (None en la última página)
+        
+        Raises:
+            ValueError: Si el cursor no es válido
+        """
+        return self._find_page(self.scrapping_collection, _source_query(source), "timestamp",
+                               limit, cursor, projection)
+
     def get_scraping_logs(self, 
                          source: Optional[str] = None, 
-                         limit: int = 10) -> List[Dict[str, Any]]:
+                         limit: int = 10,
+                         cursor: Optional[str] = None,
+                         projection: Optional[Dict[str, Any]] = SCRAPING_LOG_SUMMARY_PROJECTION) -> List[Dict[str, Any]]:
         """
         Obtiene logs de scraping, opcionalmente filtrados por fuente.
         
         Args:
             source: Fuente a filtrar (opcional)
             limit: Número máximo de logs a retornar
+            cursor: next_cursor de get_scraping_logs_page (opcional)
+            projection: Campos a incluir/excluir (por defecto sin products_data)
         
         Returns:
             list: Lista de logs de scraping
         """
         try:
-            query = {}
-            if source:
-                query["source"] = source
-            
-            return list(self.scrapping_collection.find(query)
-                       .sort("timestamp", -1)
-                       .limit(limit))
+            return self.get_scraping_logs_page(source, limit, cursor, projection)["items"]
         except Exception as e:
             logger.error(f"Error obteniendo logs de scraping: {e}")
             return []
 
+    def iter_scraping_logs(self,
+                           source: Optional[str] = None,
+                           projection: Optional[Dict[str, Any]] = SCRAPING_LOG_SUMMARY_PROJECTION,
+                           batch_size: int = 100) -> Iterator[Dict[str, Any]]:
+        """
+        Recorre todos los logs de scraping sin cargarlos en memoria a la vez.
+        
+        Args:
+            source: Fuente a filtrar (opcional)
+            projection: Campos a incluir/excluir (por defecto sin products_data)
+            batch_size: Documentos por lote traído del servidor
+        
+        Yields:
+            dict: Logs de scraping, del más reciente al más antiguo
+        """
+        yield from self._iter_sorted(self.scrapping_collection, _source_query(source), "timestamp",
+                                     projection, batch_size)
+
+    def get_last_scrape(self,
+                        source: str,
+                        keyword: str,
+                        min_pages: int = 1) -> Optional[Dict[str, Any]]:
+        """
+        Último scrape guardado de una fuente y keyword que procesó al menos
+        min_pages páginas.
+        
+        Args:
+            source: Fuente del scraping
+            keyword: Palabra clave tal como se guardó en el log
+            min_pages: Páginas mínimas procesadas
+        
+        Returns:
+            dict: timestamp y product_ids (si se registraron) del log más
+            reciente, o None si no hay ninguno
+        """
+        return self.scrapping_collection.find_one(
+            _last_scrape_query(source, keyword, min_pages),
+            {"timestamp": 1, "product_ids": 1, "_id": 0},
+            sort=_keyset_sort("timestamp")
+        )
+
+    def get_products_page(self,
+                          source: str,
+                          limit: int = 100,
+                          cursor: Optional[str] = None,
+                          projection: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        Obtiene una página de productos de una fuente, de los actualizados más
+        recientemente a los más antiguos.
+        
+        Args:
+            source: Fuente de los productos
+            limit: Número máximo de productos de la página
+            cursor: next_cursor de la página anterior (opcional)
+            projection: Campos a incluir/excluir (opcional)
+        
+        Returns:
+            dict: items y next_cursor (None en la última página)
+        
+        Raises:
+            ValueError: Si el cursor no es válido
+        """
+        return self._find_page(self.products_collection, _source_query(source), "updated_at",
+                               limit, cursor, projection)
+
     def get_products_by_source(self, 
                               source: str, 
-                              limit: int = 100) -> List[Dict[str, Any]]:
+                              limit: int = 100,
+                              cursor: Optional[str] = None,
+                              projection: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
         """
         Obtiene productos por fuente.
         
         Args:
             source: Fuente de los productos
             limit: Número máximo de productos a retornar
+            cursor: next_cursor de get_products_page (opcional)
+            projection: Campos a incluir/excluir (opcional)
         
         Returns:
             list: Lista de productos
         """
         try:
-            return list(self.products_collection.find({"source": source})
-                       .sort("updated_at", -1)
-                       .limit(limit))
+            return self.get_products_page(source, limit, cursor, projection)["items"]
         except Exception as e:
             logger.error(f"Error obteniendo productos de {source}: {e}")
             return []
 
+    def iter_products_by_source(self,
+                                source: str,
+                                projection: Optional[Dict[str, Any]] = None,
+                                batch_size: int = 500) -> Iterator[Dict[str, Any]]:
+        """
+        Recorre todos los productos de una fuente sin cargarlos en memoria a la vez.
+        
+        Args:
+            source: Fuente de los productos
+            projection: Campos a incluir/excluir (opcional)
+            batch_size: Documentos por lote traído del servidor
+        
+        Yields:
+            dict: Productos, de los actualizados más recientemente a los más antiguos
+        """
+        yield from self._iter_sorted(self.products_collection, _source_query(source), "updated_at",
+                                     projection, batch_size)
+
+    def find_products(self,
+                      source: Optional[str] = None,
+                      availability: Optional[str] = None,
+                      in_stock: Optional[bool] = None,
+                      release_from: Optional[str] = None,
+                      release_to: Optional[str] = None,
+                      price_min: Optional[int] = None,
+                      price_max: Optional[int] = None,
+                      limit: int = 50,
+                      cursor: Optional[str] = None,
+                      projection: Optional[Dict[str, Any]] = PRODUCT_PUBLIC_PROJECTION) -> Dict[str, Any]:
+        """
+        Busca productos del catálogo con filtros, de los actualizados más
+        recientemente a los más antiguos.
+        
+        Args:
+            source: Fuente de los productos (opcional)
+            availability: Disponibilidad exacta (opcional)
+            in_stock: Filtrar por stock (opcional)
+            release_from: Fecha de lanzamiento mínima, ISO 8601 (inclusive)
+            release_to: Fecha de lanzamiento límite, ISO 8601 (exclusiva)
+            price_min: Precio mínimo (inclusive)
+            price_max: Precio máximo (inclusive)
+            limit: Número máximo de productos de la página
+            cursor: next_cursor de la página anterior (opcional)
+            projection: Campos a incluir/excluir (por defecto sin content_hash)
+        
+        Returns:
+            dict: items y next_cursor (None en la última página)
+        
+        Raises:
+            ValueError: Si el cursor no es válido
+        """
+        query = _product_filter_query(source, availability, in_stock,
+                                      release_from, release_to, price_min, price_max)
+        return self._find_page(self.products_collection, query, "updated_at",
+                               limit, cursor, projection)
+
+    def search_stored_products(self,
+                               source: str,
+                               keyword: str,
+                               limit: int = 10,
+                               projection: Optional[Dict[str, Any]] = PRODUCT_PUBLIC_PROJECTION) -> List[Dict[str, Any]]:
+        """
+        Busca en el catálogo guardado los productos de una fuente cuyo título
+        contiene todas las palabras de la keyword (sin distinguir mayúsculas).
+        
+        Args:
+            source: Fuente de los productos
+            keyword: Palabra clave de búsqueda
+            limit: Número máximo de productos a retornar
+            projection: Campos a incluir/excluir (por defecto sin content_hash)
+        
+        Returns:
+            list: Productos, de los actualizados más recientemente a los más antiguos
+        """
+        query = _stored_search_query(source, keyword)
+        return list(self.products_collection.find(query, _keyset_projection(projection, "updated_at"))
+                    .sort(_keyset_sort("updated_at"))
+                    .limit(limit))
+
     def get_collection_stats(self) -> Dict[str, Any]:
         """
         Obtiene estadísticas de las colecciones.
@@ -287,11 +1248,8 @@ class MongoService:
             scraping_logs_count = self.scrapping_collection.count_documents({})
             
             # Estadísticas por fuente
-            pipeline = [
-                {"$group": {"_id": "$source", "count": {"$sum": 1}}}
-            ]
-            products_by_source = list(self.products_collection.aggregate(pipeline))
-            scraping_by_source = list(self.scrapping_collection.aggregate(pipeline))
+            products_by_source = list(self.products_collection.aggregate(SOURCE_COUNT_PIPELINE))
+            scraping_by_source = list(self.scrapping_collection.aggregate(SOURCE_COUNT_PIPELINE))
             
             return {
                 "products": {
@@ -308,7 +1266,9 @@ class MongoService:
             return {}
 
     def close_connection(self):
-        """Cierra la conexión a MongoDB"""
+        """Cierra la conexión a MongoDB (los clientes compartidos no se cierran)"""
+        if not self._owns_client:
+            return
         try:
             self.client.close()
             logger.info("Conexión a MongoDB cerrada")
@@ -324,12 +1284,54 @@ class MongoService:
         self.close_connection()
 
 
+def get_shared_client() -> MongoClient:
+    """
+    Retorna el MongoClient compartido del proceso, creándolo la primera vez.
+    MongoClient mantiene su propio pool de conexiones y es seguro entre hilos.
+    """
+    global _shared_client
+    if _shared_client is None:
+        with _shared_lock:
+            if _shared_client is None:
+                _shared_client = MongoClient(config.mongodburl, maxPoolSize=config.mongo_max_pool_size)
+    return _shared_client
+
+
+def get_mongo_service() -> MongoService:
+    """
+    Retorna el MongoService compartido del proceso.
+    Usarlo desde hilos o desde la API evita crear un cliente, reconectar y
+    crear índices en cada operación.
+    """
+    global _shared_service
+    if _shared_service is None:
+        client = get_shared_client()
+        with _shared_lock:
+            if _shared_service is None:
+                _shared_service = MongoService(client=client)
+    return _shared_service
+
+
+@atexit.register
+def close_shared_client():
+    """Cierra el cliente compartido (se llama automáticamente al salir)"""
+    global _shared_client, _shared_service
+    with _shared_lock:
+        if _shared_client is not None:
+            _shared_client.close()
+            _shared_client = None
+            _shared_service = None
+
+
 # Funciones de conveniencia para usar sin instanciar la clase
 def save_scraping_data(source: str, 
                       keyword: str, 
                       original_data: List[Dict[str, Any]], 
                       standardized_products: List[Dict[str, Any]],
-                      pages_processed: int = 1) -> Dict[str, Any]:
+                      pages_processed: int = 1,
+                      incremental: bool = False,
+                      store_raw_data: bool = True,
+                      record_product_ids: bool = False) -> Dict[str, Any]:
     """
     Función de conveniencia para guardar datos de scraping completos.
     
@@ -339,27 +1341,46 @@ def save_scraping_data(source: str,
         original_data: Datos originales del scraping
         standardized_products: Productos en formato estandarizado
         pages_processed: Número de páginas procesadas
+        incremental: Solo escribir productos cuyo precio, disponibilidad o stock cambió
+        store_raw_data: Guardar los datos originales comprimidos en GridFS
+        record_product_ids: Guardar en el log los IDs de los productos en orden
     
     Returns:
         dict: Resultado de las operaciones
     """
-    with MongoService() as mongo:
-        # Guardar log de scraping
-        scraping_id = mongo.save_scraping_log(
-            source=source,
-            keyword=keyword,
-            total_products=len(original_data),
-            pages_processed=pages_processed,
-            products_data=original_data
-        )
-        
-        # Guardar productos estandarizados
-        batch_result = mongo.upsert_products_batch(standardized_products)
-        
-        return {
-            "scraping_log_id": scraping_id,
-            "products_result": batch_result
-        }
+    mongo = get_mongo_service()
+    
+    # Guardar productos estandarizados y registrar sus cambios
+    batch_result = mongo.upsert_products_batch(
+        standardized_products, 
+        incremental=incremental, 
+        record_changes=True
+    )
+    
+    # Guardar datos originales comprimidos en GridFS
+    raw_data = None
+    if store_raw_data:
+        raw_data = mongo.save_raw_payload(source=source, keyword=keyword, products_data=original_data)
+    
+    # Guardar log de scraping compacto con el manifiesto de los datos originales
+    scraping_id = mongo.save_scraping_log(
+        source=source,
+        keyword=keyword,
+        total_products=len(original_data),
+        pages_processed=pages_processed,
+        summary={
+            field: batch_result[field]
+            for field in ("inserted_count", "updated_count", "unchanged_count", "change_event_count", "error_count")
+        },
+        raw_data=raw_data,
+        product_ids=[product['id'] for product in standardized_products if product.get('id')]
+                    if record_product_ids else None
+    )
+    
+    return {
+        "scraping_log_id": scraping_id,
+        "products_result": batch_result
+    }
 
 
 def update_single_product(source: str, 
@@ -378,24 +1399,39 @@ def update_single_product(source: str,
     Returns:
         dict: Resultado de las operaciones
     """
-    with MongoService() as mongo:
-        # Guardar log de scraping individual
-        scraping_id = mongo.save_item_scraping_log(
-            source=source,
-            product_id=product_id,
-            original_data=original_data
-        )
-        
-        # Actualizar producto con campos específicos
-        update_fields = ['title', 'price', 'availability', 'release_date', 'in_stock', 'is_preorder', 'review_images']
-        
-        product_result = mongo.upsert_product(
-            standardized_product, 
-            partial_update=True, 
-            update_fields=update_fields
-        )
-        
-        return {
-            "scraping_log_id": scraping_id,
-            "product_result": product_result
-        } 
\ No newline at end of file
+    mongo = get_mongo_service()
+    
+    # Guardar log de scraping individual
+    scraping_id = mongo.save_item_scraping_log(
+        source=source,
+        product_id=product_id,
+        original_data=original_data
+    )
+    
+    # Actualizar producto con campos específicos
+    product_result = mongo.upsert_product(
+        standardized_product, 
+        partial_update=True, 
+        update_fields=ITEM_UPDATE_FIELDS
+    )
+    
+    return {
+        "scraping_log_id": scraping_id,
+        "product_result": product_result
+    }
+
+
+if __name__ == "__main__":
+    # Verificar índices y planes de consulta: python mongo_service.py
+    import sys
+    
+    mongo = get_mongo_service()
+    mongo.ensure_indexes()
+    try:
+        query_plans = mongo.check_query_plans()
+    except QueryPlanError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+    
+    for query_name, query_stages in query_plans.items():
+        print(f"✅ {query_name}: {' -> '.join(query_stages)}")
@@ -114,7 +114,7 @@ def amiami_to_standard(item: dict) -> dict:
 
 
 
-def guardar_productos_json(keyword, max_pages=5):
+def guardar_productos_json(keyword, max_pages=5, incremental=False):
     """
     Busca productos por keyword y guarda los resultados en amiami_products.json
     También guarda una versión estandarizada en amiami_products_standard.json
@@ -122,47 +122,31 @@ def guardar_productos_json(keyword, max_pages=5):
     Args:
         keyword (str): Palabra clave para buscar
         max_pages (int): Número máximo de páginas a procesar (default: 5)
+        incremental (bool): Solo escribir en MongoDB los productos cuyo precio,
+                            disponibilidad o stock cambió
     """
     try:
         print(f"🔍 Buscando productos con keyword: '{keyword}'...")
         
-        # Búsqueda paginada
-        results = amiami.searchPaginated(keyword)
-        
         all_products = []
         standard_products = []
-        page = 1
+        page = 0
         
-        while results.hasMore and page <= max_pages:
+        # Búsqueda página a página: la siguiente página se descarga mientras
+        # se procesa la actual y no se piden páginas más allá de max_pages
+        for page_items in amiami.iter_search_pages(keyword, max_pages=max_pages):
+            page += 1
             print(f"📄 Procesando página {page}...")
             
-            for item in results.items:
-                # Obtener todos los atributos del objeto item dinámicamente
-                product_data = {}
-                
-                # Recorrer todos los atributos del objeto
-                for attr_name in dir(item):
-                    # Filtrar métodos privados y métodos especiales
-                    if not attr_name.startswith('_') and not callable(getattr(item, attr_name)):
-                        try:
-                            attr_value = getattr(item, attr_name)
-                            product_data[attr_name] = attr_value
-                        except Exception:
-                            # Si hay algún error al obtener el atributo, lo omitimos
-                            pass
+            for item in page_items:
+                # Campos crudos y propiedades calculadas del item
+                product_data = item.to_dict()
                 
                 all_products.append(product_data)
                 
                 # Convertir a formato estándar
                 standard_product = amiami_to_standard(product_data)
                 standard_products.append(standard_product)
-            
-            # Intentar cargar la siguiente página
-            if results.hasMore and page < max_pages:
-                results.searchNextPage()
-                page += 1
-            else:
-                break
         
         # Preparar datos para JSON original
         timestamp = datetime.now().isoformat()
@@ -200,13 +184,16 @@ def guardar_productos_json(keyword, max_pages=5):
                 keyword=keyword,
                 original_data=all_products,
                 standardized_products=standard_products,
-                pages_processed=page
+                pages_processed=page,
+                incremental=incremental
             )
             
             print(f"✅ Datos guardados en MongoDB:")
             print(f"   - Log de scraping ID: {mongo_result['scraping_log_id']}")
             print(f"   - Productos insertados: {mongo_result['products_result']['inserted_count']}")
             print(f"   - Productos actualizados: {mongo_result['products_result']['updated_count']}")
+            print(f"   - Productos sin cambios: {mongo_result['products_result']['unchanged_count']}")
+            print(f"   - Eventos de cambio: {mongo_result['products_result']['change_event_count']}")
             if mongo_result['products_result']['error_count'] > 0:
                 print(f"   - Errores: {mongo_result['products_result']['error_count']}")
                 
@@ -236,7 +223,7 @@ def main():
     #mostrar_informacion_detallada("evangelion")
     
     # Nueva función para guardar en JSON
-    guardar_productos_json("evangelion",max_pages=1)
+    guardar_productos_json("evangelion",max_pages=1, incremental=True)
     
     # Para actualización de producto individual, usar:
     # from amiami_single import actualizar_producto_amiami
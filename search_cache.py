@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Caché de resultados de búsqueda para la API
+Mantiene una caché LRU con TTL en memoria y, opcionalmente, una caché
+compartida en MongoDB para que varios workers de uvicorn reutilicen resultados
+"""
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import List, Dict, Any, Optional, Tuple
+
+import config
+
+logger = logging.getLogger(__name__)
+
+# Los límites se agrupan por páginas del sitio (30 productos por página)
+LIMIT_BUCKET_SIZE = 30
+
+
+def normalize_keyword(keyword: str) -> str:
+    """Normaliza una palabra clave: minúsculas y espacios colapsados"""
+    return " ".join(keyword.lower().split())
+
+
+def limit_bucket(limit: int) -> int:
+    """Redondea el límite hacia arriba al múltiplo de LIMIT_BUCKET_SIZE"""
+    return max(1, (limit + LIMIT_BUCKET_SIZE - 1) // LIMIT_BUCKET_SIZE) * LIMIT_BUCKET_SIZE
+
+
+def make_cache_key(site: str, keyword: str, limit: int) -> Tuple[str, str, int]:
+    """Construye la clave (sitio, keyword normalizada, bucket de límite)"""
+    return (site.lower(), normalize_keyword(keyword), limit_bucket(limit))
+
+
+class SearchCache:
+    """Caché LRU con TTL para resultados de búsqueda"""
+
+    def __init__(self,
+                 ttl_seconds: int = config.search_cache_ttl,
+                 max_entries: int = config.search_cache_max_entries,
+                 backend: str = config.search_cache_backend):
+        """
+        Args:
+            ttl_seconds: Segundos que una entrada se considera válida
+            max_entries: Entradas máximas en la caché en memoria
+            backend: "memory" o "mongo" (caché compartida además de la local)
+        """
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.backend = backend
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._mongo = None
+
+    @property
+    def shared(self) -> bool:
+        return self.backend == "mongo"
+
+    def _shared_service(self):
+        """Retorna el MongoService del proceso, creando el índice TTL la primera vez"""
+        if self._mongo is None:
+            from mongo_service import get_mongo_service
+            mongo = get_mongo_service()
+            mongo.ensure_search_cache_index(self.ttl_seconds)
+            self._mongo = mongo
+        return self._mongo
+
+    @staticmethod
+    def _shared_key(key: Tuple[str, str, int]) -> str:
+        return "|".join(str(part) for part in key)
+
+    def get_local(self, key) -> Optional[Tuple[List[Dict[str, Any]], float]]:
+        """
+        Busca una entrada solo en la caché en memoria (no bloquea: se puede
+        llamar desde el event loop).
+
+        Returns:
+            tuple: (productos, edad en segundos) o None si no hay entrada válida
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            products, stored_at = entry
+            age = time.time() - stored_at
+            if age > self.ttl_seconds:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return products, age
+
+    def _set_local(self, key, products: List[Dict[str, Any]], stored_at: float):
+        with self._lock:
+            self._entries[key] = (products, stored_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get_shared(self, key) -> Optional[Tuple[List[Dict[str, Any]], float]]:
+        """
+        Busca una entrada en la caché compartida de MongoDB (bloqueante) y,
+        si la encuentra, la copia a la caché en memoria.
+
+        Returns:
+            tuple: (productos, edad en segundos) o None si no hay entrada válida
+        """
+        if not self.shared:
+            return None
+
+        try:
+            doc = self._shared_service().get_cached_search(self._shared_key(key))
+        except Exception as e:
+            logger.warning(f"Caché compartida no disponible: {e}")
+            return None
+
+        if not doc:
+            return None
+        age = (datetime.now() - doc["created_at"]).total_seconds()
+        if age > self.ttl_seconds:
+            # El índice TTL de MongoDB borra con retraso; ignorar entradas vencidas
+            return None
+
+        self._set_local(key, doc["products"], time.time() - age)
+        return doc["products"], age
+
+    def get(self, key) -> Optional[Tuple[List[Dict[str, Any]], float]]:
+        """
+        Busca una entrada en la caché local y, si no está, en la compartida.
+
+        Returns:
+            tuple: (productos, edad en segundos) o None si no hay entrada válida
+        """
+        cached = self.get_local(key)
+        if cached is not None:
+            return cached
+        return self.get_shared(key)
+
+    def set(self, key, products: List[Dict[str, Any]]):
+        """Guarda productos en la caché local y, si aplica, en la compartida"""
+        self._set_local(key, products, time.time())
+
+        if self.shared:
+            try:
+                self._shared_service().save_cached_search(self._shared_key(key), products)
+            except Exception as e:
+                logger.warning(f"Caché compartida no disponible: {e}")
+
+    def clear(self):
+        """Vacía la caché en memoria"""
+        with self._lock:
+            self._entries.clear()
@@ -82,6 +82,93 @@ def test_search_endpoint(keyword="evangelion", site="amiami", limit=3):
         print(f"❌ Error de conexión: {e}")
         return False
 
+def test_multi_site_search(keyword="evangelion", limit=3):
+    """Prueba la búsqueda simultánea en todos los sitios"""
+    print(f"\n🔍 Probando búsqueda en todos los sitios: '{keyword}' (límite: {limit})...")
+    
+    params = {
+        "keyword": keyword,
+        "site": "all",
+        "limit": limit
+    }
+    
+    try:
+        response = requests.get(f"{API_BASE_URL}/search", params=params, timeout=60)
+        
+        if response.status_code == 200:
+            metadata = response.json()["metadata"]
+            print("✅ Búsqueda multi-sitio exitosa")
+            print(f"   Productos encontrados: {metadata['actual_count']}")
+            print(f"   Duplicados eliminados: {metadata['duplicates_removed']}")
+            for site_key, site_info in metadata["sites"].items():
+                if "error" in site_info:
+                    print(f"   - {site_key}: error {site_info['error']}")
+                else:
+                    print(f"   - {site_key}: {site_info['actual_count']} productos en {site_info['processing_time_seconds']}s")
+            return True
+        else:
+            print(f"❌ Error en búsqueda multi-sitio: {response.status_code}")
+            print(f"   Respuesta: {response.text}")
+            return False
+            
+    except requests.exceptions.Timeout:
+        print("❌ Timeout en la búsqueda multi-sitio (>60s)")
+        return False
+    except requests.exceptions.RequestException as e:
+        print(f"❌ Error de conexión: {e}")
+        return False
+
+def test_products_endpoint(limit=3):
+    """Prueba la consulta del catálogo guardado en MongoDB y su paginación"""
+    print(f"\n🔍 Probando catálogo /products (límite: {limit})...")
+    
+    try:
+        response = requests.get(f"{API_BASE_URL}/products", params={"limit": limit}, timeout=10)
+        
+        if response.status_code != 200:
+            print(f"❌ Error en catálogo: {response.status_code}")
+            print(f"   Respuesta: {response.text}")
+            return False
+        
+        data = response.json()
+        metadata = data["metadata"]
+        products = data["products"]
+        print("✅ Catálogo funcionando")
+        print(f"   Productos: {metadata['actual_count']} en {metadata['processing_time_seconds']}s")
+        
+        if metadata["next_cursor"]:
+            next_page = requests.get(
+                f"{API_BASE_URL}/products",
+                params={"limit": limit, "cursor": metadata["next_cursor"]},
+                timeout=10
+            ).json()["products"]
+            first_ids = {product["id"] for product in products}
+            if any(product["id"] in first_ids for product in next_page):
+                print("❌ La página siguiente repite productos")
+                return False
+            print(f"   Página siguiente: {len(next_page)} productos")
+        
+        if products:
+            product_id = products[0]["id"]
+            response = requests.get(f"{API_BASE_URL}/products/{product_id}", timeout=10)
+            if response.status_code != 200 or response.json()["product"]["id"] != product_id:
+                print(f"❌ Error obteniendo producto {product_id}: {response.status_code}")
+                return False
+            detail = response.json()
+            print(f"   Producto {product_id}: {detail['product'].get('title', 'Sin título')[:60]}")
+            print(f"   Frescura: {detail['metadata']['freshness']}")
+        
+        response = requests.get(f"{API_BASE_URL}/products/producto_inexistente", timeout=10)
+        if response.status_code != 404:
+            print(f"❌ Producto inexistente devolvió {response.status_code}")
+            return False
+        
+        return True
+        
+    except requests.exceptions.RequestException as e:
+        print(f"❌ Error de conexión: {e}")
+        return False
+
 def test_error_handling():
     """Prueba manejo de errores"""
     print("\n🔍 Probando manejo de errores...")
@@ -113,6 +200,8 @@ def run_all_tests():
         test_root_endpoint,
         test_sites_endpoint,
         lambda: test_search_endpoint("evangelion", "amiami", 2),
+        lambda: test_multi_site_search("evangelion", 2),
+        test_products_endpoint,
         test_error_handling
     ]
     